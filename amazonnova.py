@@ -1,54 +1,122 @@
 import os
+import sys
 import cv2
 import json
 import boto3
-import re
 import base64
+import time
+import random
 from datetime import datetime
-from boto3.dynamodb.conditions import Key
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from change_gate import ChangeGate
+from llm_response import parse_json_object
+from metrics import record_tokens, stage_timer
+from payload_builder import TokenEstimator, plan_batches, prepare_frame
 
 system_prompt =  """You are an expert video analysis assistant. Your task is to analyze multiple consecutive video frames, 
 recognize objects, human actions, and environmental details, and provide structured insights. Ensure consistency across frames
  and highlight any notable changes or events. The summary should be clear, concise, and formatted in JSON."""
-runtime = boto3.client("bedrock-runtime", region_name="us-east-1")
+# Concurrent Bedrock requests and throttling retries (override with environment variables)
+BEDROCK_MAX_IN_FLIGHT = int(os.environ.get("BEDROCK_MAX_IN_FLIGHT", "4"))
+BEDROCK_MAX_RETRIES = int(os.environ.get("BEDROCK_MAX_RETRIES", "5"))
+THROTTLING_ERRORS = {"ThrottlingException", "TooManyRequestsException", "ServiceUnavailableException", "ModelNotReadyException"}
+MODEL_ID = "us.amazon.nova-lite-v1:0"
+# Batch summaries merged per reduce step; the final prompt only ever sees one merged summary
+REDUCE_FANOUT = max(2, int(os.environ.get("SUMMARY_REDUCE_FANOUT", "4")))
+
+runtime = boto3.client("bedrock-runtime", region_name="us-east-1",
+                       config=Config(max_pool_connections=max(10, BEDROCK_MAX_IN_FLIGHT)))
 prompt=[]
 
-def extract_frames(video_path, output_folder, frame_interval=1):
-    os.makedirs(output_folder, exist_ok=True)
+# Processes used to decode long videos in parallel segments
+FRAME_WORKERS = int(os.environ.get("FRAME_WORKERS", str(os.cpu_count() or 1)))
+# Videos shorter than this many frames are decoded in a single process
+MIN_SEGMENT_FRAMES = 1000
 
+def extract_segment(video_path, start, end, frame_interval, jpeg_quality=95):
     cap = cv2.VideoCapture(video_path)
     if not cap.isOpened():
-        print("Error: Could not open video.")
         return []
 
-    frame_count = 0
-    saved_images = []
+    # Jump straight to the first kept frame of this segment
+    first = -(-start // frame_interval) * frame_interval
+    if first > 0:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, first)
+
+    frames = []
+    for frame_index in range(first, end):
+        if (frame_index - first) % frame_interval:
+            # grab() advances without converting the frame we don't keep
+            if not cap.grab():
+                break
+            continue
 
-    while True:
         ret, frame = cap.read()
         if not ret:
-            break  # Stop if video ends
-
-        if frame_count % frame_interval == 0:
-            img_filename = os.path.join(output_folder, f"frame_{len(saved_images):04d}.jpg")
-            cv2.imwrite(img_filename, frame)
-            saved_images.append(img_filename)
-            print(f"Saved {img_filename}")
+            break
+        _, img_encoded = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality])
+        frames.append(img_encoded.tobytes())
 
-        frame_count += 1
+    cap.release()
+    return frames
 
+def extract_frames(video_path, output_folder=None, frame_interval=1, workers=FRAME_WORKERS):
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        print("Error: Could not open video.")
+        return []
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
     cap.release()
-    print("✅ Frame extraction completed.")
-    return saved_images
 
-def image_to_base64(image_path):
+    # Split long videos into segments aligned to frame_interval and decode them in parallel.
+    # The frame count is only an estimate for many containers, so the last reader runs to EOF.
+    workers = max(1, min(workers, total_frames // MIN_SEGMENT_FRAMES))
+    if total_frames <= 0 or workers == 1:
+        frames = extract_segment(video_path, 0, sys.maxsize, frame_interval)
+    else:
+        step = -(-total_frames // workers // frame_interval) * frame_interval
+        starts = list(range(0, total_frames, step))
+        bounds = list(zip(starts, starts[1:] + [sys.maxsize]))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            segments = pool.map(extract_segment, *zip(*[(video_path, start, end, frame_interval) for start, end in bounds]))
+            frames = [frame for segment in segments for frame in segment]
+
+    # Frames stay in memory as JPEG buffers; write them out only when asked to
+    if output_folder:
+        os.makedirs(output_folder, exist_ok=True)
+        for i, frame in enumerate(frames):
+            with open(os.path.join(output_folder, f"frame_{i:04d}.jpg"), "wb") as img_file:
+                img_file.write(frame)
+
+    print(f"✅ Frame extraction completed: {len(frames)} frames.")
+    return frames
+
+def image_to_base64(image):
+    # Accepts a JPEG buffer from extract_frames or a path to an image file
     try:
-        with open(image_path, "rb") as image_file:
+        if isinstance(image, (bytes, bytearray)):
+            return base64.b64encode(image).decode("utf-8")
+        with open(image, "rb") as image_file:
             return base64.b64encode(image_file.read()).decode("utf-8")
     except Exception as e:
         print(f"Error converting image to base64: {e}")
         return None
 
+def invoke_with_retry(body, max_retries=BEDROCK_MAX_RETRIES, base_delay=0.5, max_delay=20.0):
+    for attempt in range(max_retries + 1):
+        try:
+            return runtime.invoke_model(modelId=MODEL_ID, body=body)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") not in THROTTLING_ERRORS or attempt == max_retries:
+                raise
+            # Full jitter keeps concurrent batches from retrying in lockstep
+            delay = random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+            print(f"Throttled, retrying in {delay:.2f}s (attempt {attempt + 1}/{max_retries})")
+            time.sleep(delay)
+
 def claude_prompt_image(prompt, file_base64):
     payload = {
         "system": [{"text": system_prompt}],
@@ -67,49 +135,138 @@ def claude_prompt_image(prompt, file_base64):
     payload["messages"][0]["content"].append({"text": prompt})
 
     try:
-        model_response = runtime.invoke_model(
-            modelId="us.amazon.nova-lite-v1:0",
-            body=json.dumps(payload)
-        )
-        dict_response_body = json.loads(model_response.get("body").read())
-        return dict_response_body
+        with stage_timer("bedrock"):
+            model_response = invoke_with_retry(json.dumps(payload))
+            dict_response_body = json.loads(model_response.get("body").read())
     except Exception as e:
         print(f"Error invoking model: {e}")
         return None
+    # A reply without usage is still a valid reply
+    usage = dict_response_body.get("usage", {})
+    record_tokens(usage.get("inputTokens", 0), usage.get("outputTokens", 0))
+    return dict_response_body
 
-def process_video_frames(frames):
-    batch_size = 5
-    all_batches_summary = []
-
-    # First pass: Process all frame batches
-    for i in range(0, len(frames), batch_size):
-        batch_files = frames[i:i + batch_size]
-        file_base64 = [image_to_base64(img) for img in batch_files]
+# Learns how many input tokens a frame costs from the usage Bedrock reports
+token_estimator = TokenEstimator()
 
-        print(f"Processing batch {i//batch_size + 1}/{len(frames)//batch_size + 1}")
-        
-        prompt = """Analyze these video frames and provide structured insights about:
+batch_prompt = """Analyze these video frames and provide structured insights about:
         - Main objects/people present
         - Notable actions/activities
         - Significant environmental details
         - Any important changes between frames
         Return in JSON format."""
-        
-        model_response = claude_prompt_image(prompt, file_base64)
-        
-        if model_response is not None:
+
+def summarize_batch(batch_number, total_batches, batch_frames):
+    file_base64 = [frame.data for frame in batch_frames]
+    texts = [system_prompt, batch_prompt]
+    estimated_tokens = token_estimator.request_tokens(texts, batch_frames)
+
+    print(f"Processing batch {batch_number}/{total_batches} ({len(batch_frames)} frames)")
+    
+    model_response = claude_prompt_image(batch_prompt, file_base64)
+    
+    if model_response is not None:
+        try:
+            input_tokens = model_response.get("usage", {}).get("inputTokens", 0)
+            print(f"Batch {batch_number}: estimated {estimated_tokens} input tokens, actual {input_tokens}")
+            token_estimator.observe(texts, batch_frames, input_tokens)
+
+            raw_text = model_response["output"]["message"]["content"][0]["text"]
+            return parse_json_object(raw_text)
+        except Exception as e:
+            print(f"Error processing batch {batch_number}: {str(e)}")
+    return None
+
+merge_prompt = """Merge these consecutive video segment analyses, listed in time order, into a single analysis of the whole span:
+        - Main objects/people present
+        - Notable actions/activities
+        - Significant environmental details
+        - Any important changes over time
+        Keep it about as long as one segment analysis. Return in JSON format."""
+
+def merge_summaries(level, group, summaries):
+    print(f"Merging {len(summaries)} summaries (level {level}, group {group})")
+    model_response = claude_prompt_image(f"{merge_prompt}\n{json.dumps(summaries, separators=(',', ':'))}", [])
+    if model_response is not None:
+        try:
+            return parse_json_object(model_response["output"]["message"]["content"][0]["text"])
+        except Exception as e:
+            print(f"Error merging level {level} group {group}: {str(e)}")
+    return None
+
+def reduce_summaries(pool, batches, max_in_flight, fanout=REDUCE_FANOUT):
+    # Batch summaries are the leaves of a tree with `fanout` children per node.
+    # A node is merged as soon as all its children are in, so merging overlaps
+    # the remaining batches, and no request carries more than `fanout` summaries.
+    counts = [len(batches)]
+    while counts[-1] > 1:
+        counts.append(-(-counts[-1] // fanout))
+    root = (len(counts) - 1, 0)
+
+    results = {}
+    ready = deque()
+    pending = {}
+    leaves = iter(enumerate(batches))
+
+    def node_done(level, index, summary):
+        results[(level, index)] = summary
+        if (level, index) == root:
+            return
+        group = index // fanout
+        children = range(group * fanout, min((group + 1) * fanout, counts[level]))
+        if all((level, child) in results for child in children):
+            summaries = [results.pop((level, child)) for child in children]
+            summaries = [summary for summary in summaries if summary is not None]
+            if len(summaries) > 1:
+                ready.append((level + 1, group, summaries))
+            else:
+                # Nothing to merge, so no model call
+                node_done(level + 1, group, summaries[0] if summaries else None)
+
+    while root not in results:
+        # Ready merges go ahead of new batches so the tree keeps collapsing
+        while len(pending) < max_in_flight:
+            if ready:
+                level, group, summaries = ready.popleft()
+                pending[pool.submit(merge_summaries, level, group, summaries)] = (level, group)
+                continue
+            leaf = next(leaves, None)
+            if leaf is None:
+                break
+            index, batch = leaf
+            pending[pool.submit(summarize_batch, index + 1, len(batches), batch)] = (0, index)
+
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            level, index = pending.pop(future)
             try:
-                raw_text = model_response["output"]["message"]["content"][0]["text"]
-                json_match = re.search(r'\{.*\}', raw_text, re.DOTALL)
-                if json_match:
-                    batch_summary = json.loads(json_match.group())
-                    all_batches_summary.append(batch_summary)
+                summary = future.result()
             except Exception as e:
-                print(f"Error processing batch {i//batch_size + 1}: {str(e)}")
+                print(f"Error summarizing level {level} node {index}: {str(e)}")
+                summary = None
+            node_done(level, index, summary)
+    return results[root]
+
+def process_video_frames(frames, max_in_flight=BEDROCK_MAX_IN_FLIGHT, gate=None):
+    # Drop frames that show no meaningful change from the last frame kept
+    gate = ChangeGate() if gate is None else gate
+    if gate:
+        total_frames = len(frames)
+        frames = [frame for frame in frames if gate.check(frame)]
+        print(f"Sending {len(frames)}/{total_frames} frames with scene changes to the model")
+
+    max_in_flight = max(1, max_in_flight)
+    with ThreadPoolExecutor(max_workers=max_in_flight) as pool:
+        # Downscale and recompress frames, then pack as many per request as the token budget allows
+        frames = list(pool.map(prepare_frame, frames))
+        batches = plan_batches(frames, [system_prompt, batch_prompt], token_estimator)
+
+        # First pass: summarize frame batches concurrently and merge them in video order as they finish
+        video_summary = reduce_summaries(pool, batches, max_in_flight) if batches else None
 
     # Second pass: Create consolidated summary
     final_prompt = f"""Create a comprehensive video summary from this analysis data: 
-    {json.dumps(all_batches_summary, indent=2)}
+    {json.dumps(video_summary, indent=2)}
     
     Include these elements:
     1. Overall scene description
@@ -121,17 +278,7 @@ def process_video_frames(frames):
     Use natural language paragraphs with clear structure."""
     
     try:
-        final_response = runtime.invoke_model(
-            modelId="us.amazon.nova-lite-v1:0",
-            body=json.dumps({
-                "system": [{"text": system_prompt}],
-                "messages": [{
-                    "role": "user",
-                    "content": [{"text": final_prompt}]
-                }]
-            })
-        )
-        final_summary = json.loads(final_response["body"].read())["output"]["message"]["content"][0]["text"]
+        final_summary = claude_prompt_image(final_prompt, [])["output"]["message"]["content"][0]["text"]
         return final_summary
     except Exception as e:
         print(f"Error generating final summary: {e}")
@@ -140,12 +287,11 @@ def process_video_frames(frames):
 
 if __name__ == "__main__":
     video_path = "C:\\Users\\hp\\Videos\\Screen Recordings\\Screen Recording 2025-02-22 014113.mp4"
-    output_folder = "output_frames"
     frame_interval = 30
 
     start_time = datetime.now()
     
-    extracted_frames = extract_frames(video_path, output_folder, frame_interval)
+    extracted_frames = extract_frames(video_path, frame_interval=frame_interval)
 
     if extracted_frames:
         video_summary = process_video_frames(extracted_frames)
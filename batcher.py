@@ -0,0 +1,80 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+# Batching limits (override with environment variables)
+MAX_BATCH_SIZE = int(os.environ.get("BATCH_MAX_SIZE", "8"))
+MAX_WAIT_MS = float(os.environ.get("BATCH_MAX_WAIT_MS", "10"))
+
+
+class InferenceBatcher:
+    # Collects images submitted from concurrent requests and runs them through
+    # the model as one batched call. Each caller gets a Future for its own result.
+    # max_in_flight > 1 lets several batches run at once, e.g. on a ModelPool.
+
+    def __init__(self, model, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS, max_in_flight=1, **predict_kwargs):
+        self.model = model
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.max_in_flight = max(1, int(max_in_flight))
+        self.predict_kwargs = predict_kwargs
+        self._queue = queue.Queue()
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        with self._lock:
+            self._threads = [thread for thread in self._threads if thread.is_alive()]
+            while len(self._threads) < self.max_in_flight:
+                thread = threading.Thread(target=self._run, name=f"inference-batcher-{len(self._threads)}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, image):
+        future = Future()
+        self._ensure_started()
+        self._queue.put((image, future))
+        return future
+
+    def predict(self, image, timeout=None):
+        return self.submit(image).result(timeout=timeout)
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            batch = [(image, future) for image, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            images = [image for image, _ in batch]
+            try:
+                results = self.model(images, **self.predict_kwargs)
+            except Exception as e:
+                print(f"Error in batched inference: {str(e)}")
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            if len(results) != len(batch):
+                error = RuntimeError(f"Model returned {len(results)} results for a batch of {len(batch)} images")
+                for _, future in batch:
+                    future.set_exception(error)
+                continue
+
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
@@ -0,0 +1,34 @@
+import os
+import sys
+import time
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import amazonnova
+from fake_bedrock import FakeRuntime
+
+
+def run(frames, max_in_flight, latency, throttle_rate):
+    amazonnova.runtime = FakeRuntime(latency=latency, throttle_rate=throttle_rate)
+    start = time.perf_counter()
+    amazonnova.process_video_frames(frames, max_in_flight=max_in_flight, gate=False)
+    return time.perf_counter() - start, amazonnova.runtime
+
+
+if __name__ == "__main__":
+    frame_count = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.2
+    throttle_rate = float(sys.argv[3]) if len(sys.argv) > 3 else 0.1
+    rng = np.random.default_rng(0)
+    frames = [cv2.imencode(".jpg", rng.integers(0, 255, (360, 640, 3), dtype=np.uint8))[1].tobytes()
+              for _ in range(frame_count)]
+
+    results = []
+    for max_in_flight in [1, 2, 4, 8, 16]:
+        elapsed, fake = run(frames, max_in_flight, latency, throttle_rate)
+        results.append((max_in_flight, elapsed, fake.calls, fake.throttled, fake.max_in_flight))
+
+    print(f"{'in flight':>10} {'seconds':>9} {'calls':>7} {'throttled':>10} {'peak':>6} {'speedup':>8}")
+    for max_in_flight, elapsed, calls, throttled, peak in results:
+        print(f"{max_in_flight:>10} {elapsed:>9.2f} {calls:>7} {throttled:>10} {peak:>6} {results[0][1] / elapsed:>7.1f}x")
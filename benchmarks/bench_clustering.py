@@ -0,0 +1,49 @@
+import os
+import sys
+import time
+import tracemalloc
+import numpy as np
+from scipy.spatial.distance import pdist, squareform
+from sklearn.cluster import DBSCAN
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from clustering import cluster_points, dbscan_params
+
+
+def cluster_points_pdist(points):
+    # The original implementation: full n x n matrix, then DBSCAN from scratch
+    avg_distance = np.mean(squareform(pdist(points)))
+    eps, min_samples = dbscan_params(len(points), avg_distance)
+    labels = DBSCAN(eps=eps, min_samples=min_samples).fit(points).labels_
+    return labels, eps, min_samples, avg_distance
+
+
+def synthetic_points(count, seed=0):
+    # Half the people in a few tight groups, the rest spread over a 1280x720 frame
+    rng = np.random.default_rng(seed)
+    centers = rng.uniform([100, 100], [1180, 620], (5, 2))
+    grouped = centers[rng.integers(0, 5, count // 2)] + rng.normal(0, 25, (count // 2, 2))
+    spread = rng.uniform([0, 0], [1280, 720], (count - count // 2, 2))
+    return np.vstack([grouped, spread]).astype(int)
+
+
+def measure(fn, points, repeat=3):
+    tracemalloc.start()
+    fn(points)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(points)
+    return (time.perf_counter() - start) / repeat * 1000, peak / 1024
+
+
+if __name__ == "__main__":
+    counts = [int(arg) for arg in sys.argv[1:]] or [10, 50, 200, 1000, 4000]
+    print(f"{'people':>8} {'pdist ms':>10} {'pdist KiB':>11} {'index ms':>10} {'index KiB':>11}")
+    for count in counts:
+        points = synthetic_points(count)
+        old_ms, old_kib = measure(cluster_points_pdist, points)
+        new_ms, new_kib = measure(cluster_points, points)
+        print(f"{count:>8} {old_ms:>10.2f} {old_kib:>11.0f} {new_ms:>10.2f} {new_kib:>11.0f}")
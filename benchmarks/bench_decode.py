@@ -0,0 +1,68 @@
+import os
+import io
+import sys
+import time
+import tracemalloc
+import numpy as np
+from PIL import Image
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from decode import decode_image
+from inference_profile import DETECT_SIDE, resize_to_fit
+
+IMAGES = ["icu.jpg", "Reception.jpg", "PharmacyFront.jpeg", "PharmacyBack.jpg", "EMergencyWard.jpeg", "GeneralWard.jpeg"]
+
+
+def decode_pil_rgb(image_bytes, side):
+    # The previous crowd1 path: PIL decode, RGB copy, array copy, resize
+    return resize_to_fit(np.array(Image.open(io.BytesIO(image_bytes)).convert("RGB")), side)
+
+
+def decode_pil(image_bytes, side):
+    # The previous crowd_feature path (no colour conversion at all)
+    return resize_to_fit(np.array(Image.open(io.BytesIO(image_bytes))), side)
+
+
+def decode_fast(image_bytes, side):
+    return decode_image(image_bytes, side)
+
+
+def decode_fast_reused(image_bytes, side):
+    return decode_image(image_bytes, side, reuse_buffer=True)
+
+
+DECODERS = [("pil_rgb", decode_pil_rgb), ("pil", decode_pil), ("fast", decode_fast), ("fast_reused", decode_fast_reused)]
+
+
+def measure(fn, image_bytes, side, repeat):
+    fn(image_bytes, side)  # warm-up; also allocates the reused buffer
+    # tracemalloc sees NumPy/OpenCV arrays but not PIL's internal image memory,
+    # so the PIL paths are if anything under-counted
+    tracemalloc.start()
+    fn(image_bytes, side)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(image_bytes, side)
+        samples.append((time.perf_counter() - start) * 1000)
+    return float(np.median(samples)), peak / 1024
+
+
+if __name__ == "__main__":
+    # python benchmarks/bench_decode.py [side ...]
+    sides = [int(arg) for arg in sys.argv[1:]] or [DETECT_SIDE, 640]
+    repeat = 20
+    print(f"{'image':>20} {'side':>6}" + "".join(f" {name + ' ms':>15} {name + ' KiB':>16}" for name, _ in DECODERS))
+    for side in sides:
+        for name in IMAGES:
+            with open(os.path.join(ROOT, name), "rb") as image_file:
+                image_bytes = image_file.read()
+            row = f"{name:>20} {side:>6}"
+            for _, fn in DECODERS:
+                ms, kib = measure(fn, image_bytes, side, repeat)
+                row += f" {ms:>15.2f} {kib:>16.0f}"
+            print(row)
@@ -0,0 +1,196 @@
+import os
+import io
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+import contextlib
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import numpy as np
+from sklearn.cluster import DBSCAN
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from fastapi.testclient import TestClient
+import crowd_feature
+from model_service import service
+from clustering import cluster_points, dbscan_params, mean_pairwise_distance
+from decode import decode_image
+from result_cache import ResultCache
+from zones import CameraZones
+from bench_clustering import synthetic_points
+from fake_s3 import FakeS3
+
+IMAGES = ["icu.jpg", "Reception.jpg", "PharmacyFront.jpeg", "PharmacyBack.jpg", "EMergencyWard.jpeg", "GeneralWard.jpeg"]
+BUCKET = "bench"
+
+
+def summarize(samples_ms):
+    samples = np.asarray(samples_ms)
+    return {
+        "mean_ms": round(float(samples.mean()), 3),
+        "p50_ms": round(float(np.percentile(samples, 50)), 3),
+        "p95_ms": round(float(np.percentile(samples, 95)), 3)
+    }
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    value = fn(*args)
+    return value, (time.perf_counter() - start) * 1000
+
+
+def bench_stages(image_bytes, repeat):
+    # Each stage of detect_crowd, run one after another on the same image
+    stages = {name: [] for name in ["decode", "inference", "box_extraction", "pdist", "dbscan", "zones", "draw", "encode"]}
+    zones = CameraZones({"left": [[0, 0], [0.5, 0], [0.5, 1], [0, 1]], "centre": [[0.3, 0.3], [0.7, 0.3], [0.5, 0.8]]})
+    for _ in range(repeat):
+        # Decoding includes scaling to DETECT_SIDE (see bench_decode.py for the breakdown)
+        image, ms = timed(decode_image, image_bytes)
+        stages["decode"].append(ms)
+        result, ms = timed(lambda: service.model([image], **service.predict_kwargs)[0])
+        stages["inference"].append(ms)
+        (_, points, _), ms = timed(crowd_feature.extract_people, result)
+        stages["box_extraction"].append(ms)
+        avg_distance, ms = timed(mean_pairwise_distance, points)
+        stages["pdist"].append(ms)
+        eps, min_samples = dbscan_params(len(points), avg_distance)
+        fit = lambda: DBSCAN(eps=eps, min_samples=min_samples, algorithm="kd_tree").fit(points) if len(points) >= 2 else None
+        _, ms = timed(fit)
+        stages["dbscan"].append(ms)
+        image_size = (image.shape[1], image.shape[0])
+        _, ms = timed(zones.update, points, image_size)
+        stages["zones"].append(ms)
+        detections = crowd_feature.analyze_detections(result, image_size)
+        drawn, ms = timed(crowd_feature.draw_detections, image.copy(), detections)
+        stages["draw"].append(ms)
+        _, ms = timed(cv2.imencode, ".jpg", drawn)
+        stages["encode"].append(ms)
+    return {name: summarize(samples) for name, samples in stages.items()}
+
+
+def bench_clustering(counts, repeat):
+    results = {}
+    for count in counts:
+        points = synthetic_points(count)
+        pdist_ms, cluster_ms = [], []
+        for _ in range(repeat):
+            pdist_ms.append(timed(mean_pairwise_distance, points)[1])
+            cluster_ms.append(timed(cluster_points, points)[1])
+        results[str(count)] = {"pdist": summarize(pdist_ms), "cluster_points": summarize(cluster_ms)}
+    return results
+
+
+def bench_endpoint(client, keys, concurrency, requests, response_format):
+    def call(i):
+        body = {"bucket": BUCKET, "file": keys[i % len(keys)], "response_format": response_format}
+        start = time.perf_counter()
+        response = client.post("/detect-crowd", json=body)
+        return (time.perf_counter() - start) * 1000, response.status_code
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(call, range(requests)))
+    elapsed = time.perf_counter() - start
+
+    latencies = np.array([ms for ms, _ in results])
+    return {
+        "concurrency": concurrency,
+        "format": response_format or "image",
+        "requests": requests,
+        "errors": sum(1 for _, status in results if status != 200),
+        "throughput_rps": round(requests / elapsed, 2),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 3),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 3)
+    }
+
+
+def metadata():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        "commit": commit or None,
+        "time": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count()
+    }
+
+
+def flatten(value, path=""):
+    if isinstance(value, dict):
+        for key, item in value.items():
+            yield from flatten(item, f"{path}/{key}" if path else key)
+    elif isinstance(value, list):
+        for item in value:
+            yield from flatten(item, f"{path}/{item.get('format')}@{item.get('concurrency')}")
+    elif isinstance(value, (int, float)) and path.endswith(("_ms", "_rps")):
+        yield path, value
+
+
+def compare(baseline, current, threshold):
+    # Prints every metric that moved by more than threshold (slower latency or lower throughput is a regression)
+    old = dict(flatten({key: baseline[key] for key in ("stages", "clustering", "endpoint") if key in baseline}))
+    regressions = 0
+    for path, value in flatten({key: current[key] for key in ("stages", "clustering", "endpoint")}):
+        if path not in old or not old[path]:
+            continue
+        change = value / old[path] - 1
+        if abs(change) < threshold:
+            continue
+        worse = change < 0 if path.endswith("_rps") else change > 0
+        regressions += worse
+        print(f"{'REGRESSION' if worse else 'improved':>10} {path}: {old[path]:.3f} -> {value:.3f} ({change:+.0%})", file=sys.stderr)
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the crowd-detection hot path")
+    parser.add_argument("--repeat", type=int, default=10, help="Runs per stage and per point-cloud size")
+    parser.add_argument("--requests", type=int, default=60, help="Requests per endpoint concurrency level")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--points", type=int, nargs="+", default=[10, 50, 200, 1000, 5000])
+    parser.add_argument("--output", help="Write the JSON results here instead of stdout")
+    parser.add_argument("--compare", help="Earlier JSON results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Relative change reported by --compare")
+    args = parser.parse_args()
+
+    # Every request must reach the model, and S3 lives in memory
+    crowd_feature.result_cache = ResultCache(max_entries=0)
+    crowd_feature.s3_client = FakeS3()
+    images = {name: open(os.path.join(ROOT, name), "rb").read() for name in IMAGES if os.path.exists(os.path.join(ROOT, name))}
+    keys = []
+    for name, data in images.items():
+        keys.append(f"original/{name}")
+        crowd_feature.s3_client.put_object(Bucket=BUCKET, Key=keys[-1], Body=data)
+
+    results = {"meta": dict(metadata(), profile=service.profile)}
+    # The services print per request; keep that out of the JSON output
+    with contextlib.redirect_stdout(io.StringIO()):
+        # Load and warm the model as the startup hook would
+        if not service.start().wait():
+            raise SystemExit(f"Model failed to load: {service.error}")
+        results["startup"] = service.status()["timings"]
+        results["stages"] = {name: bench_stages(data, args.repeat) for name, data in images.items()}
+        results["clustering"] = bench_clustering(args.points, args.repeat)
+        client = TestClient(crowd_feature.app)
+        results["endpoint"] = [bench_endpoint(client, keys, concurrency, args.requests, response_format)
+                               for response_format in (None, "json") for concurrency in args.concurrency]
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            output_file.write(output + "\n")
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            sys.exit(1 if compare(json.load(baseline_file), results, args.threshold) else 0)
@@ -0,0 +1,129 @@
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+from PIL import Image
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from clustering import cluster_points
+from inference_profile import PROFILES, get_profile, inference_kwargs, load_model, resize_to_fit
+from postprocess import extract_people
+
+IMAGES = ["icu.jpg", "Reception.jpg", "PharmacyFront.jpeg", "PharmacyBack.jpg", "EMergencyWard.jpeg", "GeneralWard.jpeg"]
+
+
+def box_iou(a, b):
+    # Pairwise IoU between two (n, 4) and (m, 4) xyxy arrays
+    a, b = a[:, None, :].astype(float), b[None, :, :].astype(float)
+    width = (np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0])).clip(0)
+    height = (np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1])).clip(0)
+    intersection = width * height
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    return intersection / np.maximum(area_a + area_b - intersection, 1e-9)
+
+
+def match(boxes, reference, threshold=0.5):
+    # Greedy one-to-one matching by IoU; returns how many boxes agree with the reference
+    if not len(boxes) or not len(reference):
+        return 0
+    iou = box_iou(boxes, reference)
+    used_boxes, used_reference = set(), set()
+    for i, j in zip(*np.unravel_index(np.argsort(-iou, axis=None), iou.shape)):
+        if iou[i, j] < threshold:
+            break
+        if i not in used_boxes and j not in used_reference:
+            used_boxes.add(i)
+            used_reference.add(j)
+    return len(used_boxes)
+
+
+def crowd_status(centroids):
+    if len(centroids) < 2:
+        return "No Crowd"
+    labels = cluster_points(centroids)[0]
+    return "Crowd" if (labels != -1).any() else "No Crowd"
+
+
+def run_profile(name, images, repeat):
+    profile = get_profile(name)
+    model = load_model(profile)
+    kwargs = inference_kwargs(profile)
+    model(next(iter(images.values())), **kwargs)  # Warm-up
+
+    detections = {}
+    timings = []
+    for image_name, image in images.items():
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = model(image, **kwargs)[0]
+            timings.append((time.perf_counter() - start) * 1000)
+        boxes, centroids, _ = extract_people(result)
+        detections[image_name] = {"boxes": boxes, "people": len(boxes), "crowd_status": crowd_status(centroids)}
+    return profile, timings, detections
+
+
+def compare(detections, reference):
+    matched = predicted = expected = agree = 0
+    for image_name, result in detections.items():
+        truth = reference[image_name]
+        matched += match(result["boxes"], truth["boxes"])
+        predicted += result["people"]
+        expected += truth["people"]
+        agree += result["crowd_status"] == truth["crowd_status"]
+    precision = matched / predicted if predicted else 1.0
+    recall = matched / expected if expected else 1.0
+    return {
+        "precision": round(precision, 3),
+        "recall": round(recall, 3),
+        "f1": round(2 * precision * recall / (precision + recall), 3) if precision + recall else 0.0,
+        "crowd_status_agreement": round(agree / len(detections), 3)
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Accuracy vs speed of the inference profiles on the bundled images")
+    parser.add_argument("profiles", nargs="*", default=list(PROFILES),
+                        help="Profiles to compare; the first one is the reference for accuracy")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="Also write the report as JSON")
+    args = parser.parse_args()
+
+    images = {}
+    for name in IMAGES:
+        path = os.path.join(ROOT, name)
+        if os.path.exists(path):
+            images[name] = resize_to_fit(np.array(Image.open(path).convert("RGB"))[:, :, ::-1])
+
+    report = {"reference": args.profiles[0], "images": list(images), "profiles": {}}
+    reference = None
+    for name in args.profiles:
+        try:
+            profile, timings, detections = run_profile(name, images, args.repeat)
+        except Exception as e:
+            # Exported weights only exist after `python inference_profile.py <profile>`
+            print(f"Skipping {name}: {e}", file=sys.stderr)
+            continue
+        if reference is None:
+            reference = detections
+        report["profiles"][name] = dict(
+            {key: profile[key] for key in ("weights", "imgsz", "half")},
+            mean_ms=round(float(np.mean(timings)), 2),
+            p95_ms=round(float(np.percentile(timings, 95)), 2),
+            people={image_name: result["people"] for image_name, result in detections.items()},
+            **compare(detections, reference)
+        )
+
+    print(f"{'profile':<10} {'weights':<28} {'imgsz':>5} {'mean ms':>8} {'p95 ms':>7} {'people':>7} "
+          f"{'precision':>9} {'recall':>7} {'f1':>6} {'crowd agree':>11}")
+    for name, row in report["profiles"].items():
+        print(f"{name:<10} {row['weights']:<28} {row['imgsz']:>5} {row['mean_ms']:>8.1f} {row['p95_ms']:>7.1f} "
+              f"{sum(row['people'].values()):>7} {row['precision']:>9.3f} {row['recall']:>7.3f} {row['f1']:>6.3f} "
+              f"{row['crowd_status_agreement']:>11.3f}")
+
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(report, output_file, indent=2)
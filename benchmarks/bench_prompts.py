@@ -0,0 +1,17 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from nova_llm import system_prompt
+from payload_builder import estimate_text_tokens
+from section_prompts import compact_prompts, prompts
+
+
+if __name__ == "__main__":
+    print(f"{'section':<16} {'full tokens':>12} {'compact tokens':>15} {'saved':>7}")
+
+    system_tokens = estimate_text_tokens(system_prompt)
+    for section in prompts:
+        full = system_tokens + estimate_text_tokens(prompts[section])
+        compact = system_tokens + estimate_text_tokens(compact_prompts[section])
+        print(f"{section:<16} {full:>12} {compact:>15} {(full - compact) / full:>6.0%}")
@@ -0,0 +1,108 @@
+import os
+import sys
+import json
+import time
+import argparse
+import importlib
+import subprocess
+import contextlib
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SERVICES = ["crowd1", "crowd_feature"]
+# Heavy packages whose import cost is reported when the service module pulls them in
+PACKAGES = ["ultralytics", "torch", "sklearn", "scipy", "boto3", "cv2", "fastapi", "PIL"]
+IMAGE = "icu.jpg"
+IMPORTED = "-- service imported --"
+
+
+def child(module_name):
+    # Runs in a fresh interpreter: import, startup hook, readiness, first request
+    with open(os.path.join(ROOT, IMAGE), "rb") as image_file:
+        image_bytes = image_file.read()
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(sys.stderr):
+        service = importlib.import_module(module_name)
+    imported = time.perf_counter()
+    print(IMPORTED, file=sys.stderr, flush=True)
+    from fastapi.testclient import TestClient
+
+    if module_name == "crowd_feature":
+        from fake_s3 import FakeS3
+        service.s3_client = FakeS3()
+        service.s3_client.put_object(Bucket="bench", Key=f"original/{IMAGE}", Body=image_bytes)
+
+    with contextlib.redirect_stdout(sys.stderr), TestClient(service.app) as client:
+        started = time.perf_counter()
+        # Trees without the probe (404) are ready as soon as they are imported
+        readyz = client.get("/readyz")
+        while readyz.status_code == 503 and readyz.json()["error"] is None:
+            time.sleep(0.005)
+            readyz = client.get("/readyz")
+        ready = time.perf_counter()
+
+        if module_name == "crowd_feature":
+            response = client.post("/detect-crowd", json={"bucket": "bench", "file": f"original/{IMAGE}",
+                                                          "response_format": "json"})
+        else:
+            response = client.post("/detect-crowd?format=json", files={"file": (IMAGE, image_bytes, "image/jpeg")})
+        first = time.perf_counter()
+
+    print(json.dumps({
+        "status_code": response.status_code,
+        "import_s": round(imported - start, 3),
+        "startup_to_ready_s": round(ready - started, 3),
+        "first_request_s": round(first - ready, 3),
+        "time_to_first_inference_s": round(first - start, 3),
+        "service_timings": readyz.json().get("timings", {}) if readyz.status_code == 200 else {}
+    }))
+
+
+def eager_imports(stderr):
+    # -X importtime lines logged before the service finished importing
+    cumulative = {}
+    for line in stderr.splitlines():
+        if line == IMPORTED:
+            break
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, total, name = line.split("|")
+        name = name.strip()
+        if name in PACKAGES and total.strip().isdigit():
+            cumulative[name] = round(int(total) / 1000, 1)
+    return cumulative
+
+
+def measure(module_name, runs):
+    samples = []
+    for _ in range(runs):
+        env = dict(os.environ, EVENT_STORE="none")
+        process = subprocess.run([sys.executable, "-X", "importtime", os.path.abspath(__file__), "--child", module_name],
+                                 capture_output=True, text=True, env=env, cwd=ROOT)
+        if process.returncode != 0:
+            raise SystemExit(process.stderr[-2000:])
+        result = json.loads(process.stdout.strip().splitlines()[-1])
+        result["eager_import_ms"] = eager_imports(process.stderr)
+        samples.append(result)
+
+    # Median of each timing over the runs; the rest from the first run
+    summary = dict(samples[0])
+    for key in ("import_s", "startup_to_ready_s", "first_request_s", "time_to_first_inference_s"):
+        summary[key] = round(float(np.median([sample[key] for sample in samples])), 3)
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import time and time to first inference of the detection services")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--runs", type=int, default=3, help="Fresh processes per service")
+    parser.add_argument("services", nargs="*", default=SERVICES)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child)
+    else:
+        print(json.dumps({name: measure(name, args.runs) for name in args.services}, indent=2))
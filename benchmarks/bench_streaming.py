@@ -0,0 +1,51 @@
+import os
+import sys
+import json
+import time
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import nova_llm
+from fake_bedrock import FakeRuntime
+from payload_builder import prepare_frame
+from section_prompts import section_prompt
+
+SITUATION = ("A patient in the second bed has pulled off their oxygen mask and is gasping for air. "
+             "No nurse is present at the bedside while the monitor above the bed shows an alert. ") * 6
+
+
+def run(frame, text, stream, latency, chunk_latency):
+    nova_llm.runtime = FakeRuntime(latency=latency, text=text, chunk_chars=8, chunk_latency=chunk_latency)
+    nova_llm.llm_cache = nova_llm.ResultCache()
+    classified = []
+    start = time.perf_counter()
+
+    def on_field(key, value):
+        if key == "Emergency_Type":
+            classified.append(time.perf_counter() - start)
+
+    _, _, response = nova_llm.image_process_llm(section_prompt("ICU"), [frame], stream=stream, on_field=on_field)
+    total = time.perf_counter() - start
+    # Without streaming the classification is only known once the whole body is back
+    return (classified[0] if classified else total), total, response["Emergency_Type"]
+
+
+if __name__ == "__main__":
+    latency = float(sys.argv[1]) if len(sys.argv) > 1 else 0.3
+    chunk_latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.01
+    rng = np.random.default_rng(0)
+    frame = prepare_frame(cv2.imencode(".jpg", rng.integers(0, 255, (360, 640, 3), dtype=np.uint8))[1].tobytes()).data
+
+    orders = {
+        "type first": json.dumps({"Emergency_Type": "Emergency", "situation": SITUATION}),
+        "type last": json.dumps({"situation": SITUATION, "Emergency_Type": "Emergency"})
+    }
+    rows = []
+    for order, text in orders.items():
+        for stream in (False, True):
+            rows.append((order, stream) + run(frame, text, stream, latency, chunk_latency))
+
+    print(f"{'field order':<12} {'stream':>7} {'classified ms':>14} {'total ms':>9}")
+    for order, stream, classified, total, emergency_type in rows:
+        print(f"{order:<12} {str(stream):>7} {classified * 1000:>14.0f} {total * 1000:>9.0f}")
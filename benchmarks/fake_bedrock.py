@@ -0,0 +1,119 @@
+import io
+import json
+import base64
+import random
+import threading
+import time
+from botocore.exceptions import ClientError
+from PIL import Image
+
+
+def count_input_tokens(payload, pixels_per_token=750):
+    # Rough stand-in for the model's tokenizer: 4 characters per text token and
+    # a fixed pixel budget per image token
+    tokens = system_tokens(payload)
+    for part in payload["messages"][0]["content"]:
+        if "text" in part:
+            tokens += len(part["text"]) // 4
+        elif "image" in part:
+            data = base64.b64decode(part["image"]["source"]["bytes"])
+            try:
+                width, height = Image.open(io.BytesIO(data)).size
+            except Exception:
+                width, height = 0, 0
+            tokens += width * height // pixels_per_token
+    return tokens
+
+
+def system_tokens(payload):
+    return sum(len(part.get("text", "")) for part in payload.get("system", [])) // 4
+
+
+def cached_prefix(payload):
+    # System text up to a cachePoint marker, if the request has one
+    prefix = []
+    for part in payload.get("system", []):
+        if "cachePoint" in part:
+            return "".join(prefix)
+        prefix.append(part.get("text", ""))
+    return None
+
+
+class FakeRuntime:
+    # Local stand-in for the bedrock-runtime client. Each call sleeps for a
+    # fixed latency and a share of calls fail with ThrottlingException.
+
+    def __init__(self, latency=0.2, throttle_rate=0.0, text=None, seed=0, chunk_chars=16, chunk_latency=0.0):
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.text = text or json.dumps({"situation": "Staff are attending to patients.", "Emergency_Type": "Non-Emergency"})
+        self.chunk_chars = chunk_chars
+        self.chunk_latency = chunk_latency
+        self.calls = 0
+        self.throttled = 0
+        self.max_in_flight = 0
+        self.cached_prefixes = set()
+        self._in_flight = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _respond(self, body, api):
+        with self._lock:
+            self.calls += 1
+            throttle = self._random.random() < self.throttle_rate
+            if throttle:
+                self.throttled += 1
+            self._in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self._in_flight)
+        try:
+            time.sleep(self.latency)
+            if throttle:
+                raise ClientError({"Error": {"Code": "ThrottlingException", "Message": "Too many requests"}}, api)
+            payload = json.loads(body)
+            input_tokens = count_input_tokens(payload)
+            # Prompt caching: a prefix seen before is billed as a cache read
+            prefix = cached_prefix(payload)
+            cache_read = cache_write = 0
+            if prefix is not None:
+                with self._lock:
+                    if prefix in self.cached_prefixes:
+                        cache_read = len(prefix) // 4
+                    else:
+                        cache_write = len(prefix) // 4
+                        self.cached_prefixes.add(prefix)
+            response = {
+                "output": {"message": {"role": "assistant", "content": [{"text": self.text}]}},
+                "usage": {"inputTokens": input_tokens, "outputTokens": len(self.text) // 4,
+                          "totalTokens": input_tokens + len(self.text) // 4,
+                          "cacheReadInputTokenCount": cache_read, "cacheWriteInputTokenCount": cache_write},
+                "stopReason": "end_turn",
+                "images": sum(1 for part in payload["messages"][0]["content"] if "image" in part)
+            }
+            return response
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def invoke_model(self, modelId, body):
+        response = self._respond(body, "InvokeModel")
+        # Generation time is the same as streaming; the body just arrives at the end
+        time.sleep(self.chunk_latency * -(-len(self.text) // self.chunk_chars))
+        return {"body": io.BytesIO(json.dumps(response).encode("utf-8"))}
+
+    def invoke_model_with_response_stream(self, modelId, body):
+        # The latency covers time to first token; text then arrives in chunks
+        response = self._respond(body, "InvokeModelWithResponseStream")
+        return {"body": self._events(response)}
+
+    def _events(self, response):
+        def event(payload):
+            return {"chunk": {"bytes": json.dumps(payload).encode("utf-8")}}
+
+        yield event({"messageStart": {"role": "assistant"}})
+        for start in range(0, len(self.text), self.chunk_chars):
+            time.sleep(self.chunk_latency)
+            yield event({"contentBlockDelta": {"delta": {"text": self.text[start:start + self.chunk_chars]},
+                                               "contentBlockIndex": 0}})
+        yield event({"contentBlockStop": {"contentBlockIndex": 0}})
+        yield event({"messageStop": {"stopReason": response["stopReason"]}})
+        yield event({"metadata": {"usage": response["usage"], "metrics": {}}})
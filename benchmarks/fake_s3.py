@@ -0,0 +1,28 @@
+import io
+import threading
+
+
+class FakeS3:
+    # In-memory stand-in for the parts of the S3 client the services use
+
+    def __init__(self):
+        self.objects = {}
+        self._lock = threading.Lock()
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        with self._lock:
+            self.objects[(Bucket, Key)] = bytes(Body)
+        return {}
+
+    def get_object(self, Bucket, Key):
+        with self._lock:
+            data = self.objects[(Bucket, Key)]
+        return {"Body": io.BytesIO(data), "ContentLength": len(data)}
+
+    def get_paginator(self, operation):
+        return self
+
+    def paginate(self, Bucket, Prefix=""):
+        with self._lock:
+            keys = sorted(key for bucket, key in self.objects if bucket == Bucket and key.startswith(Prefix))
+        yield {"Contents": [{"Key": key} for key in keys]}
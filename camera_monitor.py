@@ -0,0 +1,303 @@
+import os
+import time
+import heapq
+import itertools
+import threading
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Optional
+import cv2
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import Response
+from pydantic import BaseModel
+import metrics
+from event_routes import router as event_router
+from event_store import get_event_writer, record_event
+from change_gate import ChangeGate
+from nova_llm import image_process_llm, prompts, section_prompt
+from payload_builder import prepare_frame
+from section_prompts import CATEGORIES
+
+# Shared limits for all cameras (override with environment variables)
+MONITOR_WORKERS = int(os.environ.get("MONITOR_WORKERS", "8"))
+MONITOR_RATE_PER_MINUTE = float(os.environ.get("MONITOR_RATE_PER_MINUTE", "120"))
+
+# Seconds between analyses of one camera, by section
+SECTION_INTERVALS = {
+    "ICU": 15,
+    "Emergency Ward": 20,
+    "General Ward": 60,
+    "Reception": 60,
+    "Pharmacy Front": 120,
+    "Pharmacy Back": 300
+}
+DEFAULT_INTERVAL = 60
+
+# Lower runs first when several cameras are due; alerts are also checked more often
+PRIORITIES = {"Emergency": 0, "Potential Emergency": 1}
+ALERT_INTERVAL_FACTOR = {"Emergency": 0.25, "Potential Emergency": 0.5}
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+
+
+def read_frame(source):
+    # Returns JPEG/PNG bytes from a callable, snapshot URL, image file or video/RTSP source
+    if callable(source):
+        return source()
+    if source.lower().endswith(IMAGE_EXTENSIONS):
+        if source.startswith(("http://", "https://")):
+            with urllib.request.urlopen(source, timeout=10) as response:
+                return response.read()
+        with open(source, "rb") as image_file:
+            return image_file.read()
+
+    cap = cv2.VideoCapture(source)
+    try:
+        ret, frame = cap.read()
+        if not ret:
+            raise RuntimeError(f"Could not read a frame from {source}")
+        _, img_encoded = cv2.imencode(".jpg", frame)
+        return img_encoded.tobytes()
+    finally:
+        cap.release()
+
+
+class RateLimiter:
+    # Token bucket shared by every camera
+
+    def __init__(self, rate_per_minute=MONITOR_RATE_PER_MINUTE, burst=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = burst or max(1.0, self.rate * 10)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self, now):
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def wait_time(self, now):
+        self._refill(now)
+        return max(0.0, (1 - self.tokens) / self.rate) if self.rate > 0 else 60.0
+
+
+class Camera:
+    def __init__(self, camera_id, section, source, interval=None):
+        self.camera_id = camera_id
+        self.section = section
+        self.source = source
+        self.interval = interval or SECTION_INTERVALS.get(section, DEFAULT_INTERVAL)
+        self.gate = ChangeGate()
+        self.emergency_type = None
+        self.situation = None
+        self.last_run = None
+        self.last_error = None
+        self.runs = 0
+        self.errors = 0
+        self.in_flight = False
+
+    def on_field(self, key, value):
+        # Streamed answers report the classification before the situation text;
+        # values outside the schema are left for validation to reject
+        if key == "Emergency_Type" and value in CATEGORIES:
+            self.emergency_type = value
+            if value == "Emergency":
+                print(f"Emergency reported on camera {self.camera_id} ({self.section})")
+
+    def priority(self):
+        return PRIORITIES.get(self.emergency_type, 2)
+
+    def next_interval(self):
+        return self.interval * ALERT_INTERVAL_FACTOR.get(self.emergency_type, 1.0)
+
+    def status(self):
+        return {
+            "camera_id": self.camera_id,
+            "section": self.section,
+            "interval": self.interval,
+            "Emergency_Type": self.emergency_type,
+            "situation": self.situation,
+            "last_run": self.last_run,
+            "last_error": self.last_error,
+            "runs": self.runs,
+            "errors": self.errors
+        }
+
+
+class CameraMonitor:
+    # One scheduler thread hands due cameras to a shared worker pool. Cameras
+    # whose last result was an (potential) emergency go first and come back
+    # sooner; a shared rate limiter caps LLM calls across all cameras.
+
+    def __init__(self, workers=MONITOR_WORKERS, rate_per_minute=MONITOR_RATE_PER_MINUTE, analyze=None):
+        self.workers = workers
+        self.limiter = RateLimiter(rate_per_minute)
+        self.analyze = analyze or analyze_camera
+        self.cameras = {}
+        self._timers = []
+        self._ready = []
+        self._sequence = itertools.count()
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._pool = None
+        self._thread = None
+
+    def add_camera(self, camera):
+        if camera.section not in prompts:
+            raise ValueError(f"Unknown section {camera.section!r}")
+        with self._lock:
+            known = camera.camera_id in self.cameras
+            self.cameras[camera.camera_id] = camera
+            if not known:
+                heapq.heappush(self._timers, (time.monotonic(), next(self._sequence), camera.camera_id))
+        self._wake.set()
+
+    def remove_camera(self, camera_id):
+        with self._lock:
+            return self.cameras.pop(camera_id, None) is not None
+
+    def start(self):
+        self._stop.clear()
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="camera")
+        self._thread = threading.Thread(target=self._run, name="camera-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+
+    def _dispatch(self, now):
+        # Returns how long the scheduler can sleep before something is due
+        while self._timers and self._timers[0][0] <= now:
+            due, _, camera_id = heapq.heappop(self._timers)
+            camera = self.cameras.get(camera_id)
+            if camera is not None and not camera.in_flight:
+                heapq.heappush(self._ready, (camera.priority(), due, next(self._sequence), camera_id))
+
+        while self._ready and self._in_flight < self.workers:
+            if not self.limiter.try_acquire(now):
+                return self.limiter.wait_time(now)
+            _, _, _, camera_id = heapq.heappop(self._ready)
+            camera = self.cameras.get(camera_id)
+            if camera is None or camera.in_flight:
+                continue
+            camera.in_flight = True
+            self._in_flight += 1
+            self._pool.submit(self._run_camera, camera)
+
+        if self._ready and self._in_flight < self.workers:
+            return self.limiter.wait_time(now)
+        if self._timers:
+            return max(0.0, self._timers[0][0] - now)
+        return None
+
+    def _run(self):
+        while not self._stop.is_set():
+            with self._lock:
+                timeout = self._dispatch(time.monotonic())
+            self._wake.wait(timeout)
+            self._wake.clear()
+
+    def _run_camera(self, camera):
+        try:
+            suppressed = camera.gate.suppressed
+            result = self.analyze(camera)
+            if result is not None:
+                input_tokens, output_tokens, response = result
+                camera.emergency_type = response.get("Emergency_Type")
+                camera.situation = response.get("situation")
+                # An unchanged scene reuses the last answer without a model call
+                if camera.gate.suppressed > suppressed:
+                    input_tokens = output_tokens = 0
+                record_event("classification", camera.camera_id, camera.section, emergency_type=camera.emergency_type,
+                             input_tokens=input_tokens, output_tokens=output_tokens)
+            camera.last_error = None
+        except Exception as e:
+            print(f"Error analyzing camera {camera.camera_id}: {e}")
+            camera.last_error = str(e)
+            camera.errors += 1
+        finally:
+            camera.runs += 1
+            camera.last_run = datetime.now().isoformat()
+            with self._lock:
+                camera.in_flight = False
+                self._in_flight -= 1
+                if camera.camera_id in self.cameras:
+                    due = time.monotonic() + camera.next_interval()
+                    heapq.heappush(self._timers, (due, next(self._sequence), camera.camera_id))
+            self._wake.set()
+
+
+def analyze_camera(camera):
+    frame = prepare_frame(read_frame(camera.source))
+    return image_process_llm(section_prompt(camera.section), [frame.data], gate=camera.gate, on_field=camera.on_field)
+
+
+class CameraItem(BaseModel):
+    camera_id: str
+    section: str  # One of the keys in the section prompts
+    source: str  # Image path/URL or video/RTSP source
+    interval: Optional[float] = None  # Seconds between analyses; defaults by section
+
+# Initialize FastAPI app
+app = FastAPI()
+monitor = CameraMonitor()
+
+@app.on_event("startup")
+def start_monitor():
+    monitor.start()
+
+@app.on_event("shutdown")
+def stop_monitor():
+    monitor.stop()
+    writer = get_event_writer()
+    if writer is not None:
+        writer.close()
+
+app.include_router(event_router)
+
+@app.post("/cameras")
+def register_camera(item: CameraItem):
+    try:
+        monitor.add_camera(Camera(item.camera_id, item.section, item.source, item.interval))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return monitor.cameras[item.camera_id].status()
+
+@app.delete("/cameras/{camera_id}")
+def unregister_camera(camera_id: str):
+    if not monitor.remove_camera(camera_id):
+        raise HTTPException(status_code=404, detail="Camera not found.")
+    return {"camera_id": camera_id, "removed": True}
+
+@app.get("/cameras")
+def list_cameras():
+    cameras = sorted(monitor.cameras.values(), key=lambda camera: (camera.priority(), camera.camera_id))
+    return [camera.status() for camera in cameras]
+
+@app.get("/cameras/{camera_id}")
+def camera_status(camera_id: str):
+    camera = monitor.cameras.get(camera_id)
+    if camera is None:
+        raise HTTPException(status_code=404, detail="Camera not found.")
+    return camera.status()
+
+@app.get("/metrics")
+def metrics_endpoint():
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="127.0.0.1", port=8090)
@@ -0,0 +1,100 @@
+import os
+import cv2
+import numpy as np
+
+# Mean grey-level difference (0-255) that counts as a scene change
+CHANGE_THRESHOLD = float(os.environ.get("CHANGE_GATE_THRESHOLD", "6"))
+# Escalate at least once every this many frames even if nothing changed
+CHANGE_MAX_SKIP = int(os.environ.get("CHANGE_GATE_MAX_SKIP", "30"))
+
+
+def frame_signature(frame, size=(64, 36)):
+    # Small blurred greyscale thumbnail; JPEG buffers and image files are decoded at reduced size
+    if isinstance(frame, (bytes, bytearray)):
+        frame = cv2.imdecode(np.frombuffer(frame, dtype=np.uint8), cv2.IMREAD_REDUCED_GRAYSCALE_4)
+    elif isinstance(frame, (str, os.PathLike)):
+        path = frame
+        frame = cv2.imread(os.fspath(path), cv2.IMREAD_REDUCED_GRAYSCALE_4)
+        if frame is None:
+            raise ValueError(f"Could not read image file {path}")
+    if frame.ndim == 3:
+        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+    return cv2.GaussianBlur(small, (3, 3), 0).astype(np.float32)
+
+
+class ChangeGate:
+    # Decides whether a frame is worth sending to the LLM. A frame escalates when
+    # the picture changed, the person count or positions moved, or the crowd
+    # status flipped since the last escalated frame.
+
+    def __init__(self, threshold=CHANGE_THRESHOLD, max_skip=CHANGE_MAX_SKIP, count_delta=1, box_shift=40):
+        self.threshold = threshold
+        self.max_skip = max_skip
+        self.count_delta = count_delta
+        self.box_shift = box_shift
+        self.signature = None
+        self.centroids = None
+        self.crowd_status = None
+        self.skipped = 0
+        self.escalated = 0
+        self.suppressed = 0
+        self.last_result = None
+        self._candidate = None
+
+    def _moved(self, centroids):
+        if centroids is None or self.centroids is None:
+            return False
+        centroids = np.asarray(centroids, dtype=float).reshape(-1, 2)
+        if abs(len(centroids) - len(self.centroids)) >= self.count_delta:
+            return True
+        if not len(centroids) or not len(self.centroids):
+            return False
+        distances = np.linalg.norm(centroids[:, None, :] - self.centroids[None, :, :], axis=2)
+        return distances.min(axis=1).max() > self.box_shift
+
+    def changed(self, frame, centroids=None, crowd_status=None):
+        # Whether the frame should escalate. Nothing is recorded until commit(),
+        # so a failed LLM call leaves the gate comparing against the last answered scene.
+        signature = frame_signature(frame)
+        self._candidate = (signature, centroids, crowd_status)
+        return (
+            self.signature is None
+            or self.skipped >= self.max_skip
+            or float(np.abs(signature - self.signature).mean()) > self.threshold
+            or (crowd_status is not None and crowd_status != self.crowd_status)
+            or self._moved(centroids)
+        )
+
+    def commit(self):
+        # The frame last passed to changed() is the new reference scene
+        if self._candidate is None:
+            return
+        signature, centroids, crowd_status = self._candidate
+        self._candidate = None
+        self.signature = signature
+        if centroids is not None:
+            self.centroids = np.asarray(centroids, dtype=float).reshape(-1, 2)
+        if crowd_status is not None:
+            self.crowd_status = crowd_status
+        self.skipped = 0
+        self.escalated += 1
+
+    def suppress(self):
+        self.skipped += 1
+        self.suppressed += 1
+
+    def check(self, frame, centroids=None, crowd_status=None):
+        if self.changed(frame, centroids, crowd_status):
+            self.commit()
+            return True
+        self.suppress()
+        return False
+
+    def stats(self):
+        total = self.escalated + self.suppressed
+        return {
+            "escalated": self.escalated,
+            "suppressed": self.suppressed,
+            "suppressed_rate": self.suppressed / total if total else 0.0
+        }
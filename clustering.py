@@ -0,0 +1,53 @@
+import numpy as np
+
+# Above this many points the mean distance is estimated from sampled pairs
+EXACT_MEAN_LIMIT = 1024
+SAMPLE_PAIRS = 100000
+CHUNK_SIZE = 128
+
+
+def mean_pairwise_distance(points, seed=0):
+    # Same value as np.mean(squareform(pdist(points))), zero diagonal included,
+    # without building the n x n matrix
+    points = np.asarray(points, dtype=np.float64)
+    n = len(points)
+    if n < 2:
+        return 0.0
+
+    if n <= EXACT_MEAN_LIMIT:
+        from scipy.spatial.distance import cdist
+        total = 0.0
+        for start in range(0, n, CHUNK_SIZE):
+            total += cdist(points[start:start + CHUNK_SIZE], points).sum()
+        return total / (n * n)
+
+    rng = np.random.default_rng(seed)
+    i = rng.integers(0, n, SAMPLE_PAIRS)
+    j = rng.integers(0, n - 1, SAMPLE_PAIRS)
+    j += j >= i  # Never pair a point with itself
+    distances = np.linalg.norm(points[i] - points[j], axis=1)
+    return distances.mean() * (n - 1) / n
+
+
+def dbscan_params(num_points, avg_distance):
+    eps = max(50, min(150, avg_distance * 1.2))
+    min_samples = max(3, min(6, num_points // 5))
+    return eps, min_samples
+
+
+def cluster_points(points):
+    # Returns DBSCAN labels (-1 is noise) and the parameters that were used.
+    # sklearn is imported here, not at module import; warm_up() pays for it at startup
+    from sklearn.cluster import DBSCAN
+    points = np.asarray(points, dtype=np.float64)
+    avg_distance = mean_pairwise_distance(points)
+    eps, min_samples = dbscan_params(len(points), avg_distance)
+
+    # DBSCAN builds the only spatial index (a KD-tree) for its neighbour queries
+    labels = DBSCAN(eps=eps, min_samples=min_samples, algorithm="kd_tree").fit(points).labels_
+    return labels, eps, min_samples, avg_distance
+
+
+def warm_up():
+    # Imports scipy/sklearn and runs one small clustering
+    cluster_points(np.random.default_rng(0).uniform(0, 1280, (50, 2)))
@@ -1,103 +1,173 @@
 import cv2
 import numpy as np
-from ultralytics import YOLO
-from sklearn.cluster import DBSCAN
-from fastapi import FastAPI, File, UploadFile
+from fastapi import FastAPI, File, Header, UploadFile
 from fastapi.responses import JSONResponse, Response
-import io
-from PIL import Image
-from scipy.spatial.distance import pdist, squareform
+from typing import Optional
+from clustering import cluster_points
+from postprocess import draw_detections, extract_people
+from decode import decode_image
+from executor import BoundedExecutor, ExecutorBusy
+from result_cache import ResultCache, content_key, perceptual_hash
+import metrics
+from event_routes import router as event_router
+from event_store import get_event_writer, record_event
+from zone_routes import router as zone_router
+from zones import observe
+from health_routes import router as health_router
+from model_service import ModelNotReady, service
+from metrics import record_detections, stage_timer
 
 # Initialize FastAPI app
 app = FastAPI()
 
-# Load YOLO model (Ensure the model file is correctly placed)
-model = YOLO("yolov8s.pt")
+# The YOLO model for the INFERENCE_PROFILE (Ensure the weights file is correctly placed)
+# is loaded and warmed by the startup hook, not at import
 
-def detect_crowd(image_bytes):
-    try:
-        # Convert bytes to PIL image and ensure RGB mode
-        image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
-        image = np.array(image)  # Convert PIL image to NumPy array
-
-        # Resize image for better YOLO detection
-        image = cv2.resize(image, (1280, 720))
-        image_height, image_width = image.shape[:2]
-
-        # Run YOLO on the image with a confidence threshold
-        results = model(image, conf=0.3)  
-
-        # Extract (x, y) coordinates of detected people
-        person_points = []
-        for box in results[0].boxes:
-            if box is None or box.xyxy is None:
-                continue  # Skip invalid detections
-            
-            x1, y1, x2, y2 = map(int, box.xyxy.cpu().numpy()[0])  # Ensure correct format
-            class_id = int(box.cls.cpu().numpy()[0])  # Extract class ID
-
-            if class_id == 0:  # Check if detected class is 'person'
-                mid_x = (x1 + x2) // 2  # Compute center of bounding box
-                mid_y = (y1 + y2) // 2
-                person_points.append([mid_x, mid_y])
-
-                # Draw bounding box
-                cv2.rectangle(image, (x1, y1), (x2, y2), (0, 255, 0), 2)
-
-        print(f"People detected: {len(person_points)}")
-
-        # Handle case where no people are detected
-        if len(person_points) < 2:
-            cv2.putText(image, "No Crowd", (50, 50), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
-            _, img_encoded = cv2.imencode('.jpg', image)
-            return "No Crowd", img_encoded.tobytes()
-
-        # Convert person points to NumPy array
-        person_points = np.array(person_points)
-
-        # Compute average pairwise distance if there are at least 2 people
-        if len(person_points) >= 2:
-            distances = squareform(pdist(person_points))
-            avg_distance = np.mean(distances)
-
-            # Dynamically adjust DBSCAN parameters
-            eps = max(50, min(150, avg_distance * 1.2))
-            min_samples = max(3, min(6, len(person_points) // 5))
-
-            print(f"Using DBSCAN parameters: eps={eps}, min_samples={min_samples}, avg_distance={avg_distance}")
+# Run detection off the event loop, rejecting requests once the queue is full
+executor = BoundedExecutor()
 
-            # Apply DBSCAN clustering
-            dbscan = DBSCAN(eps=eps, min_samples=min_samples).fit(person_points)
-            unique_clusters = set(dbscan.labels_) - {-1}  # Ignore noise (-1)
+# Reuse results for repeated (or, if enabled, near-identical) images
+result_cache = ResultCache()
 
-            # Mark clusters on the image
-            for i, point in enumerate(person_points):
-                if dbscan.labels_[i] != -1:  # If part of a cluster
-                    cv2.circle(image, tuple(point), 10, (0, 0, 255), -1)  # Mark cluster in red
+def load_image(image_bytes):
+    # Decode straight to BGR at (close to) the detection scale, then scale without
+    # stretching into this thread's reusable buffer; YOLO letterboxes it to imgsz
+    return decode_image(image_bytes, reuse_buffer=True)
 
-            # Determine crowd status
-            crowd_status = "Crowd" if len(unique_clusters) > 0 else "No Crowd"
-        else:
-            crowd_status = "No Crowd"
-
-        # Add text to indicate crowd status
-        cv2.putText(image, crowd_status, (50, 50), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
-
-        # Encode image to return as response
-        _, img_encoded = cv2.imencode('.jpg', image)
-        return crowd_status, img_encoded.tobytes()
+def detect_crowd(image_bytes, render=True):
+    detections, processed_image = _detect_crowd(image_bytes, render)
+    # Cache hits are counted too, so the counters agree with the event store
+    if detections is not None:
+        record_detections(detections)
+    return detections, processed_image
 
+def _detect_crowd(image_bytes, render):
+    try:
+        key = content_key(image_bytes, "image" if render else "json")
+        cached = result_cache.get(key)
+        if cached is not None:
+            return cached
+
+        with stage_timer("decode"):
+            image = load_image(image_bytes)
+        phash = perceptual_hash(image) if result_cache.phash_distance else None
+        cached = result_cache.get_similar(phash, group=render)
+        if cached is not None:
+            return cached
+
+        # Run YOLO on the image with a confidence threshold, people only
+        with stage_timer("inference"):
+            result = service.predict(image)
+        detections = analyze_detections(result, (image.shape[1], image.shape[0]))
+
+        # Drawing and JPEG encoding are only needed when the image is requested
+        processed_image = None
+        if render:
+            with stage_timer("render"):
+                processed_image = render_detections(image, detections)
+        result_cache.put(key, (detections, processed_image), phash, group=render)
+        return detections, processed_image
+
+    except ModelNotReady:
+        raise
     except Exception as e:
         print(f"Error in detection: {str(e)}")
-        return "Error", None
+        metrics.STAGE_ERRORS.inc(stage="detect")
+        return None, None
+
+def analyze_detections(result, image_size):
+    # Extract boxes and (x, y) centers of detected people
+    with stage_timer("extract"):
+        boxes, person_points, _ = extract_people(result)
+
+    print(f"People detected: {len(person_points)}")
+
+    # Handle case where too few people are detected (everyone is noise)
+    labels = np.full(len(person_points), -1)
+
+    # Cluster people if there are at least 2
+    if len(person_points) >= 2:
+        # Apply DBSCAN with parameters adjusted to the average pairwise distance
+        with stage_timer("clustering"):
+            labels, eps, min_samples, avg_distance = cluster_points(person_points)
+
+        print(f"Using DBSCAN parameters: eps={eps}, min_samples={min_samples}, avg_distance={avg_distance}")
+
+    unique_clusters = np.unique(labels[labels != -1])  # Ignore noise (-1)
+
+    # Determine crowd status
+    crowd_status = "Crowd" if len(unique_clusters) > 0 else "No Crowd"
+
+    detections = {
+        "crowd_status": crowd_status,
+        "people_count": len(person_points),
+        "cluster_count": len(unique_clusters),
+        "boxes": boxes.tolist(),
+        "centroids": person_points.tolist(),
+        "cluster_labels": labels.tolist(),
+        "image_size": list(image_size)  # [width, height] the centroids refer to
+    }
+    return detections
+
+def render_detections(image, detections):
+    # Draw boxes, clustered people and the crowd status, then encode the image to return as response
+    _, img_encoded = cv2.imencode('.jpg', draw_detections(image, detections))
+    return img_encoded.tobytes()
+
+def wants_json(response_format, accept):
+    # An explicit ?format= wins; otherwise JSON only when asked for instead of an image
+    if response_format:
+        return response_format.lower() == "json"
+    accept = accept or ""
+    return "application/json" in accept and "image/" not in accept
 
 @app.post("/detect-crowd")
-async def upload_image(file: UploadFile = File(...)):
+async def upload_image(file: UploadFile = File(...), format: Optional[str] = None, accept: Optional[str] = Header(None),
+                       camera_id: Optional[str] = None, section: Optional[str] = None):
     image_bytes = await file.read()
-    crowd_status, processed_image = detect_crowd(image_bytes)
-
-    if processed_image is None:
+    render = not wants_json(format, accept)
+    try:
+        detections, processed_image = await executor.run(detect_crowd, image_bytes, render)
+    except ExecutorBusy:
+        return JSONResponse(content={"error": "Server busy, try again later"}, status_code=503, headers={"Retry-After": "1"})
+    except ModelNotReady:
+        return JSONResponse(content={"error": "Model is still loading, try again later"}, status_code=503,
+                            headers={"Retry-After": "5"})
+
+    if detections is None:
         return JSONResponse(content={"error": "Failed to process image"}, status_code=500)
 
+    # Queued for the background event writer; never waits on storage
+    record_event("detection", camera_id, section, crowd_status=detections["crowd_status"],
+                 people_count=detections["people_count"], cluster_count=detections["cluster_count"])
+    # Per-zone counts and the camera's heatmap are updated incrementally
+    zone_counts = observe(camera_id, section, detections)
+
+    if not render:
+        return JSONResponse(content={**detections, "zones": zone_counts})
+
     headers = {"Content-Disposition": "inline; filename=processed_image.jpg"}
     return Response(content=processed_image, media_type="image/jpeg", headers=headers)
+
+@app.get("/cache-stats")
+def cache_stats():
+    return result_cache.stats()
+
+app.include_router(event_router)
+app.include_router(health_router)
+app.include_router(zone_router)
+
+@app.on_event("startup")
+def start_model_service():
+    # Loads and warms the model in the background; /readyz reports when it is done
+    service.start()
+
+@app.on_event("shutdown")
+def flush_events():
+    writer = get_event_writer()
+    if writer is not None:
+        writer.close()
+
+@app.get("/metrics")
+def metrics_endpoint():
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
@@ -1,104 +1,232 @@
 import cv2
 import numpy as np
-from ultralytics import YOLO
-from sklearn.cluster import DBSCAN
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, Header, HTTPException
+from fastapi.responses import JSONResponse, Response
 import io
-from PIL import Image
-from scipy.spatial.distance import pdist, squareform
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+from clustering import cluster_points
+from postprocess import draw_detections, extract_people
 import base64
 from pydantic import BaseModel
+import shutil
 import tempfile
-import boto3
-from botocore.exceptions import NoCredentialsError
+import threading
+from decode import decode_image
+from result_cache import ResultCache, file_content_key, perceptual_hash
+import metrics
+from event_routes import router as event_router
+from event_store import get_event_writer, record_event
+from zone_routes import router as zone_router
+from zones import observe
+from health_routes import router as health_router
+from model_service import service
+from metrics import record_detections, stage_timer
 
-# Define S3 client
-s3_client = boto3.client('s3', region_name='us-east-1')
+# Concurrent S3 transfers for batch requests (override with environment variables)
+S3_MAX_CONNECTIONS = int(os.environ.get("S3_MAX_CONNECTIONS", "32"))
+BATCH_CONCURRENCY = int(os.environ.get("BATCH_CONCURRENCY", "16"))
+# Downloads larger than this are spooled to a temporary file instead of memory
+S3_SPILL_BYTES = int(os.environ.get("S3_SPILL_BYTES", str(32 * 1024 * 1024)))
+
+# Created on first use (normally by the startup warm-up), so boto3 isn't imported with this module
+s3_client = None
+_s3_client_lock = threading.Lock()
+
+def get_s3_client():
+    global s3_client
+    if s3_client is None:
+        with _s3_client_lock:
+            if s3_client is None:
+                import boto3
+                from botocore.config import Config
+                # Define S3 client (pooled connections are shared by all threads)
+                s3_client = boto3.client('s3', region_name='us-east-1',
+                                         config=Config(max_pool_connections=S3_MAX_CONNECTIONS))
+    return s3_client
 
 class Item(BaseModel):
     bucket: str  # Bucket name passed dynamically
     file: str  # S3 key
+    response_format: Optional[str] = None  # "json" skips drawing, encoding and upload
+    camera_id: Optional[str] = None  # Recorded with the detection event
+    section: Optional[str] = None
+
+class BatchItem(BaseModel):
+    bucket: str  # Bucket name passed dynamically
+    files: List[str] = []  # S3 keys
+    prefix: Optional[str] = None  # Process every object under this prefix
+    max_keys: int = 1000  # Limit on keys taken from the prefix
+    response_format: Optional[str] = None  # "json" skips drawing, encoding and upload
+    camera_id: Optional[str] = None  # Recorded with the detection events
+    section: Optional[str] = None
 
 # Initialize FastAPI app
 app = FastAPI()
 
-# Load YOLO model
-model = YOLO("yolov8s.pt")
-
-def detect_crowd(image_bytes):
-    image = np.array(Image.open(io.BytesIO(image_bytes)))
-    image = cv2.resize(image, (1280, 720))
-    
-    results = model(image, conf=0.3)
-
-    person_points = []
-    for box in results[0].boxes:
-        x1, y1, x2, y2 = map(int, box.xyxy[0])
-        class_id = int(box.cls[0])
+# The YOLO model for the INFERENCE_PROFILE is loaded and warmed by the startup hook,
+# together with the S3 client
+service.add_warm_up("s3_client", get_s3_client)
 
-        if class_id == 0:
-            mid_x = (x1 + x2) // 2
-            mid_y = (y1 + y2)
-            person_points.append([mid_x, mid_y])
+# Reuse results for repeated (or, if enabled, near-identical) images
+result_cache = ResultCache()
 
-            cv2.rectangle(image, (x1, y1), (x2, y2), (0, 255, 0), 2)
+def detect_crowd(image_file, render=True):
+    detections, processed_image = _detect_crowd(image_file, render)
+    # Cache hits are counted too, so the counters agree with the event store
+    record_detections(detections)
+    return detections, processed_image
 
-    print(f"People detected: {len(person_points)}")
+def _detect_crowd(image_file, render):
+    key = file_content_key(image_file, "image" if render else "json")
+    cached = result_cache.get(key)
+    if cached is not None:
+        return cached
 
-    if len(person_points) < 2:
-        return "No Crowd", image
+    with stage_timer("decode"):
+        # BGR whatever the input format (PNG alpha and greyscale included)
+        image = decode_image(image_file, reuse_buffer=True)
 
-    person_points = np.array(person_points)
-    distances = squareform(pdist(person_points))
-    avg_distance = np.mean(distances)
+    phash = perceptual_hash(image) if result_cache.phash_distance else None
+    cached = result_cache.get_similar(phash, group=render)
+    if cached is not None:
+        return cached
+    
+    with stage_timer("inference"):
+        result = service.predict(image)
+    detections = analyze_detections(result, (image.shape[1], image.shape[0]))
 
-    eps = max(50, min(150, avg_distance * 1.2))
-    min_samples = max(3, min(6, len(person_points) // 5))
+    processed_image = None
+    if render:
+        with stage_timer("render"):
+            processed_image = render_detections(image, detections)
+    result_cache.put(key, (detections, processed_image), phash, group=render)
+    return detections, processed_image
 
-    dbscan = DBSCAN(eps=eps, min_samples=min_samples).fit(person_points)
-    unique_clusters = set(dbscan.labels_) - {-1}
+def analyze_detections(result, image_size):
+    with stage_timer("extract"):
+        boxes, person_points, _ = extract_people(result)
+    print(f"People detected: {len(person_points)}")
 
-    for i, point in enumerate(person_points):
-        if dbscan.labels_[i] != -1:
-            cv2.circle(image, tuple(point), 10, (0, 0, 255), -1)
+    labels = np.full(len(person_points), -1)
+    if len(person_points) >= 2:
+        with stage_timer("clustering"):
+            labels, eps, min_samples, avg_distance = cluster_points(person_points)
 
+    unique_clusters = np.unique(labels[labels != -1])
     crowd_status = "Crowd" if len(unique_clusters) > 0 else "No Crowd"
 
-    cv2.putText(image, crowd_status, (50, 50), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
+    detections = {
+        "crowd_status": crowd_status,
+        "people_count": len(person_points),
+        "cluster_count": len(unique_clusters),
+        "boxes": boxes.tolist(),
+        "centroids": person_points.tolist(),
+        "cluster_labels": labels.tolist(),
+        "image_size": list(image_size)  # [width, height] the centroids refer to
+    }
+    return detections
 
-    _, img_encoded = cv2.imencode('.jpg', image)
-    return crowd_status, img_encoded.tobytes()
+def render_detections(image, detections):
+    _, img_encoded = cv2.imencode('.jpg', draw_detections(image, detections))
+    return img_encoded.tobytes()
+
+def wants_json(response_format, accept):
+    # An explicit response_format wins; otherwise follow the Accept header
+    if response_format:
+        return response_format.lower() == "json"
+    accept = accept or ""
+    return "application/json" in accept and "image/" not in accept
 
 def download_s3_file(bucket_name, s3_key):
+    with metrics.STAGE_SECONDS.time(stage="s3_download"):
+        return _download_s3_file(bucket_name, s3_key)
+
+def _download_s3_file(bucket_name, s3_key):
     try:
-        with tempfile.NamedTemporaryFile(delete=False) as temp_file:
-            s3_client.download_fileobj(bucket_name, s3_key, temp_file)
-            temp_file_path = temp_file.name
-        return temp_file_path
+        response = get_s3_client().get_object(Bucket=bucket_name, Key=s3_key)
+        body = response["Body"]
+        if response.get("ContentLength", 0) <= S3_SPILL_BYTES:
+            # BytesIO shares the downloaded bytes, so decoding needs no extra copy
+            return io.BytesIO(body.read())
+
+        # Large objects go to a temporary file that is removed when closed
+        temp_file = tempfile.SpooledTemporaryFile(max_size=S3_SPILL_BYTES)
+        shutil.copyfileobj(body, temp_file)
+        temp_file.seek(0)
+        return temp_file
     except Exception as e:
         print(f"An error occurred: {e}")
+        metrics.STAGE_ERRORS.inc(stage="s3_download")
         return None
 
 def upload_to_s3(image_bytes, bucket_name, s3_key):
-    try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".jpg") as temp_file:
-            temp_file.write(image_bytes)
-            temp_file_path = temp_file.name
+    with metrics.STAGE_SECONDS.time(stage="s3_upload"):
+        return _upload_to_s3(image_bytes, bucket_name, s3_key)
 
-        s3_client.upload_file(temp_file_path, bucket_name, s3_key)
+def _upload_to_s3(image_bytes, bucket_name, s3_key):
+    from botocore.exceptions import NoCredentialsError
+    try:
+        get_s3_client().put_object(Bucket=bucket_name, Key=s3_key, Body=image_bytes, ContentType="image/jpeg")
         #s3_url = f"https://{bucket_name}.s3.amazonaws.com/{s3_key}"
         print(f"Uploaded processed image.")
-        return None
+        return True
     except NoCredentialsError:
         print("AWS credentials not found. Please configure your credentials.")
-        return None
+        metrics.STAGE_ERRORS.inc(stage="s3_upload")
+        return False
     except Exception as e:
         print(f"Error uploading to S3: {e}")
-        return None
+        metrics.STAGE_ERRORS.inc(stage="s3_upload")
+        return False
+
+def list_s3_keys(bucket_name, prefix, max_keys):
+    keys = []
+    paginator = get_s3_client().get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix):
+        for obj in page.get("Contents", []):
+            keys.append(obj["Key"])
+            if len(keys) >= max_keys:
+                return keys
+    return keys
+
+def processed_key(s3_key):
+    # The processed image goes under "processed" next to the original, never over it
+    processed_s3_key = s3_key.replace("original", "processed")
+    if processed_s3_key == s3_key:
+        raise ValueError("Key does not contain 'original'; refusing to overwrite it.")
+    return processed_s3_key
+
+def process_s3_key(bucket_name, s3_key, render=True, camera_id=None, section=None):
+    processed_s3_key = processed_key(s3_key) if render else None
+
+    img_file = download_s3_file(bucket_name, s3_key)
+    if not img_file:
+        raise RuntimeError("Failed to download the file from S3.")
+
+    # Concurrent calls are grouped into batched YOLO runs by the batcher
+    with img_file:
+        detections, processed_image = detect_crowd(img_file, render)
+    record_event("detection", camera_id, section, crowd_status=detections["crowd_status"],
+                 people_count=detections["people_count"], cluster_count=detections["cluster_count"])
+    zone_counts = observe(camera_id, section, detections)
+
+    if not render:
+        return {"file": s3_key, **detections, "zones": zone_counts}
+
+    if not upload_to_s3(processed_image, bucket_name, processed_s3_key):
+        raise RuntimeError("Failed to upload the processed image to S3.")
+
+    return {"file": s3_key, "processed_file": processed_s3_key, "crowd_status": detections["crowd_status"]}
+
+def require_ready():
+    if not service.ready():
+        raise HTTPException(status_code=503, detail="Model is still loading, try again later.", headers={"Retry-After": "5"})
 
 @app.post("/detect-crowd")
-def crowd_detection(item: Item):
+def crowd_detection(item: Item, accept: Optional[str] = Header(None)):
+    require_ready()
     try:
         s3_key = item.file
         bucket_name = item.bucket
@@ -107,29 +235,109 @@ def crowd_detection(item: Item):
         if not s3_key or not bucket_name:
             raise HTTPException(status_code=400, detail="Bucket and file key are required in the request body.")
 
-        temp_file_path = download_s3_file(bucket_name, s3_key)
-        if not temp_file_path:
+        render = not wants_json(item.response_format, accept)
+        if render:
+            try:
+                processed_s3_key = processed_key(s3_key)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+
+        img_file = download_s3_file(bucket_name, s3_key)
+        if not img_file:
             raise HTTPException(status_code=500, detail="Failed to download the file from S3.")
 
-        with open(temp_file_path, "rb") as img_file:
-            img_bytes = img_file.read()
+        with img_file:
+            detections, processed_image = detect_crowd(img_file, render)
+        # Queued for the background event writer; never waits on storage
+        record_event("detection", item.camera_id, item.section, crowd_status=detections["crowd_status"],
+                     people_count=detections["people_count"], cluster_count=detections["cluster_count"])
+        # Per-zone counts and the camera's heatmap are updated incrementally
+        zone_counts = observe(item.camera_id, item.section, detections)
 
-        crowd_status, processed_image = detect_crowd(img_bytes)
+        if not render:
+            return {**detections, "zones": zone_counts}
+
+        crowd_status = detections["crowd_status"]
         image_base64 = base64.b64encode(processed_image).decode("utf-8")
 
 
         # Upload the processed image to S3
-        processed_s3_key = s3_key.replace("original", "processed")
         upload_to_s3(processed_image, bucket_name, processed_s3_key)
 
         return {
             "crowd_status": crowd_status,
             "processed_image": image_base64        }
 
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"An error occurred: {e}")
+        metrics.STAGE_ERRORS.inc(stage="detect")
         raise HTTPException(status_code=500, detail="An internal error occurred.")
 
+@app.post("/detect-crowd/batch")
+def crowd_detection_batch(item: BatchItem, accept: Optional[str] = Header(None)):
+    require_ready()
+    bucket_name = item.bucket
+    if not bucket_name:
+        raise HTTPException(status_code=400, detail="Bucket is required in the request body.")
+
+    s3_keys = list(dict.fromkeys(item.files))
+    if item.prefix is not None:
+        try:
+            s3_keys += [key for key in list_s3_keys(bucket_name, item.prefix, item.max_keys) if key not in s3_keys]
+        except Exception as e:
+            print(f"An error occurred: {e}")
+            raise HTTPException(status_code=500, detail="Failed to list files in S3.")
+
+    if not s3_keys:
+        raise HTTPException(status_code=400, detail="Provide a list of file keys or a prefix that matches files.")
+
+    # Download, detect and upload every key concurrently; one failure does not stop the rest
+    render = not wants_json(item.response_format, accept)
+    with ThreadPoolExecutor(max_workers=BATCH_CONCURRENCY) as pool:
+        futures = [(s3_key, pool.submit(process_s3_key, bucket_name, s3_key, render, item.camera_id, item.section)) for s3_key in s3_keys]
+
+    results = []
+    for s3_key, future in futures:
+        try:
+            results.append(future.result())
+        except Exception as e:
+            print(f"An error occurred for {s3_key}: {e}")
+            metrics.STAGE_ERRORS.inc(stage="detect")
+            results.append({"file": s3_key, "error": str(e)})
+
+    failed = sum(1 for result in results if "error" in result)
+    return {
+        "total": len(results),
+        "succeeded": len(results) - failed,
+        "failed": failed,
+        "results": results
+    }
+
+@app.get("/cache-stats")
+def cache_stats():
+    return result_cache.stats()
+
+app.include_router(event_router)
+app.include_router(health_router)
+app.include_router(zone_router)
+
+@app.on_event("startup")
+def start_model_service():
+    # Loads and warms the model in the background; /readyz reports when it is done
+    service.start()
+
+@app.on_event("shutdown")
+def flush_events():
+    writer = get_event_writer()
+    if writer is not None:
+        writer.close()
+
+@app.get("/metrics")
+def metrics_endpoint():
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="127.0.0.1", port=8080)
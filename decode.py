@@ -0,0 +1,106 @@
+import io
+import os
+import threading
+from collections import OrderedDict
+import cv2
+import numpy as np
+from PIL import Image
+from inference_profile import DETECT_SIDE, fit_size, resize_to_fit
+
+# "auto" decodes JPEGs with PyTurboJPEG when it is installed, otherwise with
+# OpenCV (also built on libjpeg-turbo); "opencv" forces the latter
+IMAGE_DECODER = os.environ.get("IMAGE_DECODER", "auto")
+# Resize outputs kept per thread for reuse, one per distinct frame shape
+DECODE_BUFFERS = int(os.environ.get("DECODE_BUFFERS", "4"))
+
+JPEG_MAGIC = b"\xff\xd8"
+# EXIF rotation is not applied, the same as the previous PIL decode
+REDUCED_FLAGS = {1: cv2.IMREAD_COLOR, 2: cv2.IMREAD_REDUCED_COLOR_2, 4: cv2.IMREAD_REDUCED_COLOR_4,
+                 8: cv2.IMREAD_REDUCED_COLOR_8}
+
+_turbo = None
+_local = threading.local()
+
+
+def _turbojpeg():
+    global _turbo
+    if _turbo is None:
+        _turbo = False
+        if IMAGE_DECODER == "auto":
+            try:
+                from turbojpeg import TurboJPEG, TJPF_BGR
+                _turbo = (TurboJPEG(), TJPF_BGR)
+            except (ImportError, OSError):
+                # OSError: the Python package is there but libturbojpeg is not
+                pass
+    return _turbo or None
+
+
+def reduction_factor(width, height, side=DETECT_SIDE):
+    # Largest JPEG DCT scale (1/2, 1/4 or 1/8) whose output is still at least side pixels long
+    longest = max(width, height)
+    for factor in (8, 4, 2):
+        if -(-longest // factor) >= side:
+            return factor
+    return 1
+
+
+def _read_bytes(image):
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        return image
+    if isinstance(image, io.BytesIO):
+        # Shares the buffer BytesIO was created from instead of copying it
+        return image.getvalue()
+    image.seek(0)
+    return image.read()
+
+
+def _decode_jpeg(data, side):
+    turbo = _turbojpeg()
+    if turbo is not None:
+        decoder, pixel_format = turbo
+        try:
+            width, height, _, _ = decoder.decode_header(data)
+            factor = reduction_factor(width, height, side)
+            return decoder.decode(data, pixel_format=pixel_format, scaling_factor=(1, factor) if factor > 1 else None)
+        except Exception:
+            # e.g. CMYK JPEGs, which OpenCV converts itself
+            pass
+    width, height = Image.open(io.BytesIO(data)).size  # header only
+    flags = REDUCED_FLAGS[reduction_factor(width, height, side)] | cv2.IMREAD_IGNORE_ORIENTATION
+    return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), flags)
+
+
+def _buffer(shape):
+    buffers = getattr(_local, "buffers", None)
+    if buffers is None:
+        buffers = _local.buffers = OrderedDict()
+    buffer = buffers.pop(shape, None)
+    if buffer is None:
+        buffer = np.empty(shape, dtype=np.uint8)
+    buffers[shape] = buffer
+    while len(buffers) > DECODE_BUFFERS:
+        buffers.popitem(last=False)
+    return buffer
+
+
+def decode_image(image, side=DETECT_SIDE, reuse_buffer=False):
+    # Bytes or a file object to a BGR uint8 array whose long side is side pixels.
+    # JPEGs are decoded at the smallest DCT scale that is still large enough and
+    # straight to BGR; other formats go through OpenCV, or PIL if it can't read them.
+    # With reuse_buffer the result is a per-thread buffer that the next call on
+    # the same thread overwrites, so it must not be kept past the request.
+    data = _read_bytes(image)
+    decoded = None
+    if data[:2] == JPEG_MAGIC:
+        decoded = _decode_jpeg(data, side)
+    if decoded is None:
+        decoded = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR | cv2.IMREAD_IGNORE_ORIENTATION)
+    if decoded is None:
+        decoded = cv2.cvtColor(np.asarray(Image.open(io.BytesIO(data)).convert("RGB")), cv2.COLOR_RGB2BGR)
+
+    height, width = decoded.shape[:2]
+    size = fit_size(width, height, side)
+    if size is None:
+        return decoded
+    return resize_to_fit(decoded, side, dst=_buffer((size[1], size[0], 3)) if reuse_buffer else None)
@@ -0,0 +1,46 @@
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, HTTPException
+from event_store import get_event_writer
+
+# Time-range and per-camera queries over the event store, shared by the services
+router = APIRouter()
+
+
+def _epoch(value):
+    return value.timestamp() if value is not None else None
+
+
+def _backend():
+    writer = get_event_writer()
+    if writer is None:
+        raise HTTPException(status_code=404, detail="Event store is disabled.")
+    return writer.backend
+
+
+@router.get("/events")
+def list_events(camera_id: Optional[str] = None, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                kind: Optional[str] = None, zone: Optional[str] = None, limit: int = 1000):
+    # Events still buffered in the writer show up after the next flush
+    events = _backend().query(camera_id, _epoch(start), _epoch(end), kind, limit, zone)
+    for event in events:
+        event["timestamp"] = datetime.fromtimestamp(event["timestamp"]).isoformat()
+    return events
+
+
+@router.get("/events/rollup")
+def rollup_events(camera_id: Optional[str] = None, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                  kind: Optional[str] = None, zone: Optional[str] = None, bucket_seconds: int = 300):
+    if bucket_seconds <= 0:
+        raise HTTPException(status_code=400, detail="bucket_seconds must be positive.")
+    # kind=zone gives per-zone occupancy, e.g. the peak count at a counter each hour
+    buckets = _backend().rollup(camera_id, _epoch(start), _epoch(end), kind, bucket_seconds, zone)
+    for bucket in buckets:
+        bucket["bucket_start"] = datetime.fromtimestamp(bucket["bucket_start"]).isoformat()
+    return buckets
+
+
+@router.get("/events/stats")
+def event_stats():
+    writer = get_event_writer()
+    return writer.stats() if writer is not None else {}
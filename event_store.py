@@ -0,0 +1,302 @@
+import os
+import time
+import queue
+import sqlite3
+import threading
+from decimal import Decimal
+
+# Backend and writer settings (override with environment variables)
+EVENT_STORE = os.environ.get("EVENT_STORE", "none")  # "sqlite", "dynamodb" or "none"
+EVENT_DB_PATH = os.environ.get("EVENT_DB_PATH", "events.db")
+EVENT_TABLE = os.environ.get("EVENT_TABLE", "crowd-events")
+# e.g. http://localhost:8000 for DynamoDB Local
+DYNAMODB_ENDPOINT = os.environ.get("DYNAMODB_ENDPOINT")
+EVENT_BATCH_SIZE = int(os.environ.get("EVENT_BATCH_SIZE", "100"))
+EVENT_FLUSH_SECONDS = float(os.environ.get("EVENT_FLUSH_SECONDS", "1.0"))
+EVENT_QUEUE_SIZE = int(os.environ.get("EVENT_QUEUE_SIZE", "10000"))
+
+FIELDS = ["camera_id", "section", "timestamp", "kind", "crowd_status", "people_count", "cluster_count",
+          "emergency_type", "input_tokens", "output_tokens", "zone"]
+NUMERIC_FIELDS = {"timestamp", "people_count", "cluster_count", "input_tokens", "output_tokens"}
+
+
+def make_event(kind, camera_id=None, section=None, timestamp=None, **values):
+    # kind is "detection", "classification" or "zone"; unknown values are ignored
+    event = {field: values.get(field) for field in FIELDS}
+    event.update(kind=kind, camera_id=camera_id or "default", section=section,
+                 timestamp=time.time() if timestamp is None else timestamp)
+    return event
+
+
+def rollup(events, bucket_seconds):
+    # Per-bucket peak people and clusters, crowded frames and token totals;
+    # zone events get a row per zone
+    buckets = {}
+    for event in events:
+        start = event["timestamp"] // bucket_seconds * bucket_seconds
+        zone = event.get("zone")
+        row = buckets.setdefault((event["camera_id"], zone or "", start), {
+            "camera_id": event["camera_id"], "zone": zone, "bucket_start": start, "events": 0, "peak_people": 0,
+            "peak_clusters": 0, "crowd_events": 0, "emergencies": 0, "input_tokens": 0, "output_tokens": 0
+        })
+        row["events"] += 1
+        row["peak_people"] = max(row["peak_people"], event["people_count"] or 0)
+        row["peak_clusters"] = max(row["peak_clusters"], event["cluster_count"] or 0)
+        row["crowd_events"] += event["crowd_status"] == "Crowd"
+        row["emergencies"] += event["emergency_type"] == "Emergency"
+        row["input_tokens"] += event["input_tokens"] or 0
+        row["output_tokens"] += event["output_tokens"] or 0
+    return [buckets[key] for key in sorted(buckets)]
+
+
+class SQLiteBackend:
+    # Single-file store with indexes on (camera_id, timestamp) and timestamp
+
+    def __init__(self, path=EVENT_DB_PATH):
+        self.path = path
+        self._connection = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS events (camera_id TEXT NOT NULL, section TEXT, timestamp REAL NOT NULL, "
+                "kind TEXT NOT NULL, crowd_status TEXT, people_count INTEGER, cluster_count INTEGER, "
+                "emergency_type TEXT, input_tokens INTEGER, output_tokens INTEGER, zone TEXT)")
+            columns = [row[1] for row in self._connection.execute("PRAGMA table_info(events)")]
+            if "zone" not in columns:
+                # Databases created before zone counting
+                self._connection.execute("ALTER TABLE events ADD COLUMN zone TEXT")
+            self._connection.execute("CREATE INDEX IF NOT EXISTS events_camera_time ON events (camera_id, timestamp)")
+            self._connection.execute("CREATE INDEX IF NOT EXISTS events_time ON events (timestamp)")
+        return self._connection
+
+    def _where(self, camera_id, start, end, kind, zone):
+        clauses, params = [], []
+        for clause, value in (("camera_id = ?", camera_id), ("timestamp >= ?", start),
+                              ("timestamp < ?", end), ("kind = ?", kind), ("zone = ?", zone)):
+            if value is not None:
+                clauses.append(clause)
+                params.append(value)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def write_batch(self, events):
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.executemany(f"INSERT INTO events ({', '.join(FIELDS)}) VALUES ({', '.join('?' * len(FIELDS))})",
+                                       [[event[field] for field in FIELDS] for event in events])
+
+    def query(self, camera_id=None, start=None, end=None, kind=None, limit=1000, zone=None):
+        where, params = self._where(camera_id, start, end, kind, zone)
+        with self._lock:
+            rows = self._connect().execute(
+                f"SELECT {', '.join(FIELDS)} FROM events{where} ORDER BY timestamp LIMIT ?", params + [limit]).fetchall()
+        return [dict(zip(FIELDS, row)) for row in rows]
+
+    def rollup(self, camera_id=None, start=None, end=None, kind=None, bucket_seconds=300, zone=None):
+        where, params = self._where(camera_id, start, end, kind, zone)
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT camera_id, zone, CAST(timestamp / ? AS INTEGER) * ? AS bucket_start, COUNT(*), "
+                "MAX(COALESCE(people_count, 0)), MAX(COALESCE(cluster_count, 0)), "
+                "SUM(crowd_status = 'Crowd'), SUM(emergency_type = 'Emergency'), "
+                "SUM(COALESCE(input_tokens, 0)), SUM(COALESCE(output_tokens, 0)) "
+                f"FROM events{where} GROUP BY camera_id, zone, bucket_start ORDER BY camera_id, zone, bucket_start",
+                [bucket_seconds, bucket_seconds] + params).fetchall()
+        names = ["camera_id", "zone", "bucket_start", "events", "peak_people", "peak_clusters", "crowd_events",
+                 "emergencies", "input_tokens", "output_tokens"]
+        results = [dict(zip(names, row)) for row in rows]
+        for result in results:
+            for name in names[3:]:
+                result[name] = result[name] or 0
+        return results
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+class DynamoDBBackend:
+    # Partition key camera_id, sort key "sk" (zero-padded timestamp plus a
+    # sequence number, so same-instant events don't overwrite each other)
+
+    def __init__(self, table_name=EVENT_TABLE, endpoint_url=DYNAMODB_ENDPOINT, region_name="us-east-1"):
+        import boto3
+        self.table_name = table_name
+        self.dynamodb = boto3.resource("dynamodb", region_name=region_name, endpoint_url=endpoint_url)
+        self.table = self.dynamodb.Table(table_name)
+        self._sequence = 0
+        self._lock = threading.Lock()
+
+    def create_table(self):
+        self.table = self.dynamodb.create_table(
+            TableName=self.table_name,
+            KeySchema=[{"AttributeName": "camera_id", "KeyType": "HASH"}, {"AttributeName": "sk", "KeyType": "RANGE"}],
+            AttributeDefinitions=[{"AttributeName": "camera_id", "AttributeType": "S"},
+                                  {"AttributeName": "sk", "AttributeType": "S"}],
+            BillingMode="PAY_PER_REQUEST")
+        self.table.wait_until_exists()
+
+    @staticmethod
+    def _sort_key(timestamp):
+        return f"{timestamp:017.6f}"
+
+    def write_batch(self, events):
+        with self.table.batch_writer() as batch:
+            for event in events:
+                with self._lock:
+                    self._sequence += 1
+                    sequence = self._sequence
+                item = {field: Decimal(str(value)) if field in NUMERIC_FIELDS else value
+                        for field, value in event.items() if value is not None}
+                item["sk"] = f"{self._sort_key(event['timestamp'])}#{sequence:012d}"
+                batch.put_item(Item=item)
+
+    def _items(self, camera_id, start, end, kind, zone):
+        from boto3.dynamodb.conditions import Attr, Key
+        low = self._sort_key(start if start is not None else 0)
+
+        def time_range(sk):
+            # "<end>#<sequence>" sorts after "<end>", so like SQLite the range stops before events at `end`
+            return sk.gte(low) if end is None else sk.between(low, self._sort_key(end))
+
+        kwargs = {}
+        filters = [Attr(name).eq(value) for name, value in (("kind", kind), ("zone", zone)) if value is not None]
+        if camera_id is not None:
+            operation = self.table.query
+            kwargs["KeyConditionExpression"] = Key("camera_id").eq(camera_id) & time_range(Key("sk"))
+        else:
+            # No camera means every partition; a scan with the time range as a filter
+            operation = self.table.scan
+            filters.insert(0, time_range(Attr("sk")))
+        if filters:
+            expression = filters[0]
+            for condition in filters[1:]:
+                expression = expression & condition
+            kwargs["FilterExpression"] = expression
+        while True:
+            page = operation(**kwargs)
+            for item in page["Items"]:
+                yield {field: (float(item[field]) if field == "timestamp" else int(item[field]))
+                       if field in NUMERIC_FIELDS and field in item else item.get(field) for field in FIELDS}
+            if "LastEvaluatedKey" not in page:
+                break
+            kwargs["ExclusiveStartKey"] = page["LastEvaluatedKey"]
+
+    def query(self, camera_id=None, start=None, end=None, kind=None, limit=1000, zone=None):
+        return sorted(self._items(camera_id, start, end, kind, zone), key=lambda event: event["timestamp"])[:limit]
+
+    def rollup(self, camera_id=None, start=None, end=None, kind=None, bucket_seconds=300, zone=None):
+        return rollup(self._items(camera_id, start, end, kind, zone), bucket_seconds)
+
+    def close(self):
+        pass
+
+
+class EventWriter:
+    # Buffers events in memory and writes them from a background thread in
+    # batches of up to batch_size, at least every flush_interval seconds.
+    # record() never blocks: when the buffer is full the event is dropped.
+
+    def __init__(self, backend, batch_size=EVENT_BATCH_SIZE, flush_interval=EVENT_FLUSH_SECONDS,
+                 max_queue=EVENT_QUEUE_SIZE):
+        self.backend = backend
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def _ensure_started(self):
+        # Started on first use so forked model workers don't inherit the thread
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="event-writer", daemon=True)
+                    self._thread.start()
+
+    def record(self, event):
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.dropped += 1
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size and batch[-1] is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, events):
+        try:
+            self.backend.write_batch(events)
+            self.written += len(events)
+        except Exception as e:
+            print(f"Error writing {len(events)} events: {e}")
+            self.failed += len(events)
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            # None is the close() marker: write what came before it and stop
+            events = [event for event in batch if event is not None]
+            if events:
+                self._write(events)
+            if len(events) != len(batch):
+                return
+
+    def close(self, timeout=10):
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout)
+            self._thread = None
+        self.backend.close()
+
+    def stats(self):
+        return {"written": self.written, "dropped": self.dropped, "failed": self.failed, "queued": self._queue.qsize()}
+
+
+def open_backend(kind=EVENT_STORE):
+    if kind == "sqlite":
+        return SQLiteBackend()
+    if kind == "dynamodb":
+        return DynamoDBBackend()
+    if kind == "none":
+        return None
+    raise ValueError(f"Unknown EVENT_STORE {kind!r}")
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_event_writer():
+    # Process-wide writer for the configured backend, or None when disabled
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            backend = open_backend()
+            _writer = EventWriter(backend) if backend is not None else False
+    return _writer or None
+
+
+def record_event(kind, camera_id=None, section=None, **values):
+    writer = get_event_writer()
+    if writer is not None:
+        writer.record(make_event(kind, camera_id, section, **values))
@@ -0,0 +1,40 @@
+import os
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Worker and queue limits (override with environment variables)
+MAX_WORKERS = int(os.environ.get("DETECT_WORKERS", str(max(4, os.cpu_count() or 1))))
+MAX_PENDING = int(os.environ.get("DETECT_MAX_PENDING", str(MAX_WORKERS * 4)))
+
+
+class ExecutorBusy(Exception):
+    pass
+
+
+class BoundedExecutor:
+    # Thread pool that refuses new work once every worker is busy and the
+    # pending queue is full, so callers can shed load instead of piling up.
+
+    def __init__(self, max_workers=MAX_WORKERS, max_pending=MAX_PENDING):
+        self.max_workers = max(1, int(max_workers))
+        self.max_pending = max(0, int(max_pending))
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="detect")
+        self._slots = threading.BoundedSemaphore(self.max_workers + self.max_pending)
+
+    def submit(self, fn, *args, **kwargs):
+        if not self._slots.acquire(blocking=False):
+            raise ExecutorBusy("Detection queue is full")
+        try:
+            future = self._executor.submit(fn, *args, **kwargs)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    async def run(self, fn, *args, **kwargs):
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,20 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from model_service import service
+
+# Liveness and readiness probes, shared by the detection services
+router = APIRouter()
+
+
+@router.get("/healthz")
+def healthz():
+    # Alive while the model loads; only a failed load is worth a restart
+    if service.error is not None:
+        return JSONResponse(content={"status": "error", "error": service.error}, status_code=500)
+    return {"status": "ok"}
+
+
+@router.get("/readyz")
+def readyz():
+    status = service.status()
+    return JSONResponse(content=status, status_code=200 if status["ready"] else 503)
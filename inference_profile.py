@@ -0,0 +1,120 @@
+import os
+import sys
+import hashlib
+import cv2
+
+PERSON_CLASS = 0
+
+# Images are scaled (not stretched) so their long side is this many pixels; the
+# clustering distances are tuned for this scale. YOLO then letterboxes to imgsz.
+DETECT_SIDE = int(os.environ.get("DETECT_SIDE", "1280"))
+
+# weights: .pt, exported .onnx (needs onnxruntime) or OpenVINO directory (needs openvino);
+# half only applies on GPU
+PROFILES = {
+    "accurate": {"weights": "yolov8s.pt", "imgsz": 1280, "half": False},
+    "balanced": {"weights": "yolov8s.pt", "imgsz": 640, "half": False},
+    "fast": {"weights": "yolov8n.pt", "imgsz": 480, "half": False},
+    "gpu-half": {"weights": "yolov8s.pt", "imgsz": 640, "half": True},
+    "cpu-onnx": {"weights": "yolov8s.onnx", "imgsz": 640, "half": False},
+    "cpu-int8": {"weights": "yolov8s_int8_openvino_model", "imgsz": 640, "half": False}
+}
+# How the exported profiles are produced from their .pt source (see export_profile)
+EXPORTS = {
+    "cpu-onnx": {"source": "yolov8s.pt", "format": "onnx", "dynamic": True, "simplify": True},
+    "cpu-int8": {"source": "yolov8s.pt", "format": "openvino", "int8": True}
+}
+
+INFERENCE_PROFILE = os.environ.get("INFERENCE_PROFILE", "balanced")
+# Keeps fused .pt checkpoints here so later starts skip fusing, and exports a
+# missing cpu-onnx/cpu-int8 model once instead of failing ("" disables both)
+MODEL_CACHE_DIR = os.environ.get("MODEL_CACHE_DIR", "")
+
+
+def get_profile(name=None):
+    # Named profile, with YOLO_WEIGHTS / YOLO_IMGSZ / YOLO_HALF overriding its fields
+    name = name or INFERENCE_PROFILE
+    if name not in PROFILES:
+        raise ValueError(f"Unknown inference profile {name!r}; choose from {', '.join(PROFILES)}")
+    profile = dict(PROFILES[name], name=name)
+    profile["weights"] = os.environ.get("YOLO_WEIGHTS", profile["weights"])
+    profile["imgsz"] = int(os.environ.get("YOLO_IMGSZ", profile["imgsz"]))
+    profile["half"] = os.environ.get("YOLO_HALF", "1" if profile["half"] else "0") == "1"
+    return profile
+
+
+def load_model(profile):
+    from ultralytics import YOLO
+    weights = profile["weights"]
+    if MODEL_CACHE_DIR:
+        if weights.endswith(".pt"):
+            return load_fused(weights)
+        if not os.path.exists(weights) and profile["name"] in EXPORTS:
+            weights = str(export_profile(profile["name"]))
+    return YOLO(weights, task="detect")
+
+
+def fused_path(weights):
+    # Cache entry for these weights and library versions
+    import torch
+    import ultralytics
+    stat = os.stat(weights) if os.path.exists(weights) else None
+    key = [os.path.abspath(weights), stat and (stat.st_size, stat.st_mtime_ns), ultralytics.__version__, torch.__version__]
+    digest = hashlib.blake2b(repr(key).encode("utf-8"), digest_size=8).hexdigest()
+    return os.path.join(MODEL_CACHE_DIR, f"{os.path.splitext(os.path.basename(weights))[0]}-{digest}.fused.pt")
+
+
+def load_fused(weights):
+    # Conv+BatchNorm fusion normally runs on the first predict; a fused checkpoint
+    # has no BatchNorm layers left, so ultralytics skips that step when it loads one
+    import torch
+    from ultralytics import YOLO
+    path = fused_path(weights)
+    if os.path.exists(path):
+        return YOLO(path, task="detect")
+
+    model = YOLO(weights, task="detect")
+    model.model.fuse(verbose=False)
+    os.makedirs(MODEL_CACHE_DIR, exist_ok=True)
+    # Written under a temporary name so a crash never leaves a partial checkpoint
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    torch.save({**model.ckpt, "model": model.model, "ema": None}, temp_path)
+    os.replace(temp_path, path)
+    print(f"Cached fused model at {path}")
+    return model
+
+
+def inference_kwargs(profile, conf=0.3):
+    # Non-person classes are dropped by the model's NMS instead of in Python
+    return {"conf": conf, "classes": [PERSON_CLASS], "imgsz": profile["imgsz"], "half": profile["half"], "verbose": False}
+
+
+def fit_size(width, height, side=DETECT_SIDE):
+    # (width, height) with the long side scaled to side, or None if it already is
+    scale = side / max(height, width)
+    if scale == 1:
+        return None
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def resize_to_fit(image, side=DETECT_SIDE, dst=None):
+    # dst, if given, must already have the fitted shape and is written in place
+    height, width = image.shape[:2]
+    size = fit_size(width, height, side)
+    if size is None:
+        return image
+    interpolation = cv2.INTER_AREA if side < max(height, width) else cv2.INTER_LINEAR
+    return cv2.resize(image, size, dst=dst, interpolation=interpolation)
+
+
+def export_profile(name):
+    from ultralytics import YOLO
+    settings = dict(EXPORTS[name])
+    source = settings.pop("source")
+    return YOLO(source).export(imgsz=PROFILES[name]["imgsz"], **settings)
+
+
+if __name__ == "__main__":
+    # python inference_profile.py cpu-onnx  -> writes the exported weights next to the .pt file
+    for name in sys.argv[1:] or list(EXPORTS):
+        print(f"{name}: {export_profile(name)}")
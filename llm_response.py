@@ -0,0 +1,131 @@
+import json
+from typing import Literal
+from pydantic import BaseModel, ValidationError
+
+# Some section prompts spell the field with a space
+FIELD_ALIASES = {"Emergency Type": "Emergency_Type"}
+
+
+class LLMResponseError(ValueError):
+    def __init__(self, message, raw_text=None):
+        super().__init__(message)
+        self.raw_text = raw_text
+
+
+class SectionResponse(BaseModel):
+    situation: str
+    Emergency_Type: Literal["Emergency", "Potential Emergency", "Non-Emergency"]
+
+
+class JSONFieldParser:
+    # Incremental parser for the first top-level JSON object in model output.
+    # Text before the object (e.g. a ```json fence) is skipped, and each
+    # top-level field is returned from feed() as soon as its value is complete,
+    # so a short field can be acted on while a long one is still streaming.
+
+    def __init__(self):
+        self.fields = {}
+        self.done = False
+        self._buffer = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._expect = None  # "key", ":", "value", "in_value" or "next"
+        self._key = None
+        self._start = None
+
+    def _emit(self, raw, completed):
+        try:
+            value = json.loads(raw, strict=False)
+        except json.JSONDecodeError as e:
+            raise LLMResponseError(f"Invalid JSON value for {self._key!r}: {e}", self._buffer)
+        key = FIELD_ALIASES.get(self._key, self._key)
+        self.fields[key] = value
+        completed.append((key, value))
+        self._expect = "next"
+
+    def feed(self, text):
+        completed = []
+        self._buffer += text
+        buffer = self._buffer
+        while self._pos < len(buffer) and not self.done:
+            i, c = self._pos, buffer[self._pos]
+            self._pos += 1
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._expect == "key":
+                        self._key = json.loads(buffer[self._start:i + 1], strict=False)
+                        self._expect = ":"
+                    elif self._depth == 1 and self._expect == "in_value":
+                        self._emit(buffer[self._start:i + 1], completed)
+                continue
+
+            if self._depth == 0:
+                if c == "{":
+                    self._depth = 1
+                    self._expect = "key"
+                continue
+
+            scalar = self._expect == "in_value" and self._depth == 1 and buffer[self._start] not in '"{['
+            if c == '"':
+                self._in_string = True
+                if self._depth == 1 and self._expect in ("key", "value"):
+                    self._start = i
+                    if self._expect == "value":
+                        self._expect = "in_value"
+            elif c in "{[":
+                if self._depth == 1 and self._expect == "value":
+                    self._start = i
+                    self._expect = "in_value"
+                self._depth += 1
+            elif c in "}]":
+                if scalar:
+                    self._emit(buffer[self._start:i].strip(), completed)
+                self._depth -= 1
+                if self._depth == 1 and self._expect == "in_value":
+                    self._emit(buffer[self._start:i + 1], completed)
+                elif self._depth == 0:
+                    self.done = True
+            elif self._depth == 1 and c == ":" and self._expect == ":":
+                self._expect = "value"
+            elif self._depth == 1 and c == ",":
+                if scalar:
+                    self._emit(buffer[self._start:i].strip(), completed)
+                self._expect = "key"
+            elif self._depth == 1 and self._expect == "value" and not c.isspace():
+                self._start = i
+                self._expect = "in_value"
+        return completed
+
+
+def parse_json_object(text):
+    # First complete JSON object in the text, or LLMResponseError
+    parser = JSONFieldParser()
+    parser.feed(text)
+    if not parser.done:
+        raise LLMResponseError("No complete JSON object in model output", text)
+    return parser.fields
+
+
+def validate_section_response(fields, raw_text=None):
+    try:
+        response = SectionResponse(**fields)
+    except (TypeError, ValidationError) as e:
+        raise LLMResponseError(f"Model output does not match the response schema: {e}", raw_text)
+    return {"situation": response.situation, "Emergency_Type": response.Emergency_Type}
+
+
+def parse_section_response(text):
+    try:
+        fields = parse_json_object(text)
+    except LLMResponseError:
+        # Some replies come back with the JSON quotes escaped
+        fields = parse_json_object(text.replace('\\"', '"'))
+    return validate_section_response(fields, text)
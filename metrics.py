@@ -0,0 +1,122 @@
+import time
+import threading
+from contextlib import contextmanager
+
+# Upper bounds in seconds; covers S3 round trips, YOLO and multi-second Bedrock calls
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_registry = []
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}  # labels -> (per-bucket counts, sum, count)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            counts, total, count = self._values.get(key) or ([0] * len(self.buckets), 0.0, 0)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self._values[key] = (counts, total + value, count + 1)
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', bound)])} {cumulative}")
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', '+Inf')])} {count}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+STAGE_SECONDS = Histogram("crowd_stage_duration_seconds", "Time spent in each pipeline stage.", ["stage"])
+STAGE_ERRORS = Counter("crowd_stage_errors_total", "Errors raised or handled in each pipeline stage.", ["stage"])
+PEOPLE_DETECTED = Counter("crowd_people_detected_total", "People detected across all analysed images.")
+CROWD_STATUS = Counter("crowd_status_total", "Analysed images by crowd status.", ["status"])
+LLM_TOKENS = Counter("llm_tokens_total", "Bedrock tokens by direction.", ["direction"])
+
+
+@contextmanager
+def stage_timer(stage):
+    # Times the block into the stage histogram and counts it as an error if it raises
+    try:
+        with STAGE_SECONDS.time(stage=stage):
+            yield
+    except Exception:
+        STAGE_ERRORS.inc(stage=stage)
+        raise
+
+
+def record_detections(detections):
+    PEOPLE_DETECTED.inc(detections["people_count"])
+    CROWD_STATUS.inc(status=detections["crowd_status"])
+
+
+def record_tokens(input_tokens, output_tokens):
+    LLM_TOKENS.inc(input_tokens, direction="input")
+    LLM_TOKENS.inc(output_tokens, direction="output")
+
+
+def render():
+    # Prometheus text exposition format
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
@@ -0,0 +1,82 @@
+import os
+import gc
+import signal
+import multiprocessing
+import cv2
+import numpy as np
+
+# Number of forked inference processes (0 keeps inference in the server process).
+# Forking a process that is already running other threads can leave the workers
+# stuck on locks those threads held, so with workers the model is loaded, warmed
+# and forked synchronously in the startup hook, on the main thread and before the
+# server takes requests; /healthz only answers once that is done.
+MODEL_WORKERS = int(os.environ.get("MODEL_WORKERS", "0"))
+# torch/OpenCV threads per worker (0 splits the CPU cores evenly between workers)
+THREADS_PER_WORKER = int(os.environ.get("MODEL_THREADS_PER_WORKER", "0"))
+
+# Model shared with the forked workers through copy-on-write memory
+_model = None
+
+
+def set_thread_count(threads):
+    cv2.setNumThreads(threads)
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+
+
+def warm_up(model, shape=(720, 1280, 3), **predict_kwargs):
+    # The first call fuses layers and allocates buffers; do it once up front
+    model(np.zeros(shape, dtype=np.uint8), **{"verbose": False, **predict_kwargs})
+
+
+def _init_worker(threads):
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    set_thread_count(threads)
+
+
+def _predict(images, kwargs):
+    results = [result.cpu() for result in _model(images, **kwargs)]
+    for result in results:
+        # Only the boxes are needed by the caller; don't send the frame back
+        result.orig_img = None
+    return results
+
+
+class ModelPool:
+    # Forks inference workers from a parent that already loaded and warmed the
+    # model, so every worker shares the same weights instead of loading its own.
+
+    def __init__(self, model, workers=MODEL_WORKERS, threads_per_worker=THREADS_PER_WORKER, **predict_kwargs):
+        global _model
+        self.workers = max(1, int(workers))
+        self.threads_per_worker = threads_per_worker or max(1, (os.cpu_count() or 1) // self.workers)
+
+        # Warm up single-threaded so no OpenMP thread pool exists at fork time
+        set_thread_count(1)
+        warm_up(model, **predict_kwargs)
+        _model = model
+
+        # Keep the garbage collector from touching (and copying) the shared pages
+        gc.collect()
+        gc.freeze()
+
+        context = multiprocessing.get_context("fork")
+        self._pool = context.Pool(self.workers, initializer=_init_worker, initargs=(self.threads_per_worker,))
+        print(f"Started {self.workers} inference workers with {self.threads_per_worker} threads each")
+
+    def __call__(self, images, **kwargs):
+        return self._pool.apply(_predict, (images, kwargs))
+
+    def close(self):
+        self._pool.terminate()
+        self._pool.join()
+
+
+def start_model_pool(model, workers=MODEL_WORKERS, **predict_kwargs):
+    # Returns the model unchanged when no worker pool is configured
+    if workers <= 0:
+        return model
+    return ModelPool(model, workers, **predict_kwargs)
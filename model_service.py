@@ -0,0 +1,99 @@
+import time
+import threading
+from batcher import InferenceBatcher
+from clustering import warm_up as warm_up_clustering
+from inference_profile import get_profile, inference_kwargs, load_model
+from model_pool import MODEL_WORKERS, start_model_pool, warm_up
+
+
+class ModelNotReady(RuntimeError):
+    pass
+
+
+class ModelService:
+    # Loads, warms and serves the YOLO model of a detection service. start() is
+    # called from the app's startup hook and does the work on a background
+    # thread, so the server answers /healthz meanwhile; /readyz turns 200 once
+    # requests can be served. With forked inference workers the work is done on
+    # the calling thread instead (see MODEL_WORKERS).
+
+    def __init__(self):
+        self.profile = get_profile()
+        self.predict_kwargs = inference_kwargs(self.profile)
+        self.model = None
+        self.batcher = None
+        self.error = None
+        self.timings = {}
+        self._warm_ups = [("clustering", warm_up_clustering)]
+        self._ready = threading.Event()
+        self._finished = threading.Event()
+        self._thread = None
+        self._started = False
+        self._lock = threading.Lock()
+
+    def add_warm_up(self, name, fn):
+        # Extra startup work (lazy imports, clients) that must finish before ready
+        self._warm_ups.append((name, fn))
+
+    def start(self):
+        with self._lock:
+            if self._started:
+                return self
+            self._started = True
+        if MODEL_WORKERS > 0:
+            # The pool forks its workers, which must happen before the server runs any other threads
+            self._load()
+        else:
+            self._thread = threading.Thread(target=self._load, name="model-loader", daemon=True)
+            self._thread.start()
+        return self
+
+    def _timed(self, name, fn, *args, **kwargs):
+        start = time.perf_counter()
+        value = fn(*args, **kwargs)
+        self.timings[f"{name}_seconds"] = round(time.perf_counter() - start, 3)
+        return value
+
+    def _load(self):
+        start = time.perf_counter()
+        try:
+            model = self._timed("load", load_model, self.profile)
+            if MODEL_WORKERS > 0:
+                # The pool runs the warm-up inference itself, before forking its workers
+                model = self._timed("warm_up", start_model_pool, model, **self.predict_kwargs)
+            else:
+                self._timed("warm_up", warm_up, model, **self.predict_kwargs)
+            for name, fn in self._warm_ups:
+                self._timed(name, fn)
+
+            self.model = model
+            # Gather images from concurrent requests into batched YOLO calls
+            self.batcher = InferenceBatcher(model, max_in_flight=max(1, MODEL_WORKERS), **self.predict_kwargs)
+            self.timings["ready_seconds"] = round(time.perf_counter() - start, 3)
+            self._ready.set()
+            print(f"Model ready ({self.profile['name']} profile) in {self.timings['ready_seconds']}s")
+        except Exception as e:
+            print(f"Error loading model: {e}")
+            self.error = str(e)
+        finally:
+            self._finished.set()
+
+    def ready(self):
+        return self._ready.is_set()
+
+    def wait(self, timeout=None):
+        # True once ready; False on timeout or if loading failed
+        self._finished.wait(timeout)
+        return self.ready()
+
+    def predict(self, image):
+        if not self.ready():
+            raise ModelNotReady("Model is still loading.")
+        return self.batcher.predict(image)
+
+    def status(self):
+        return {"ready": self.ready(), "profile": self.profile["name"], "error": self.error, "timings": dict(self.timings)}
+
+
+# One model per service process
+service = ModelService()
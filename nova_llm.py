@@ -0,0 +1,154 @@
+import logging
+import json
+import boto3, botocore
+import os
+import base64
+from datetime import datetime, timedelta
+import time
+from result_cache import ResultCache, content_key, perceptual_hash_jpeg
+from payload_builder import TokenEstimator, frame_from_base64, prepare_frame
+from section_prompts import prompts, section_prompt
+from llm_response import JSONFieldParser, parse_section_response
+from metrics import record_tokens, stage_timer
+
+system_prompt = """Act as a human camera operator who can observe and understand every detail of an images, including subtle elements
+                   such as lighting, textures, objects, humans, human behaviours, colors, spatial relationships, and any notable 
+                   features, to provide a comprehensive and accurate details in multiple frames.""" 
+
+runtime = boto3.client("bedrock-runtime", region_name="us-east-1")
+
+# Put the section rubric in the system block behind a cache point so Bedrock can
+# reuse the prefix across calls (the prefix must be long enough to be cached)
+PROMPT_CACHING = os.environ.get("NOVA_PROMPT_CACHING", "0") == "1"
+
+# Stream answers so Emergency_Type is known before the situation text finishes
+STREAM_RESPONSES = os.environ.get("NOVA_STREAM", "0") == "1"
+
+prompt=[]
+
+# Reuse LLM answers for repeated (or, if enabled, near-identical) frames
+llm_cache = ResultCache()
+
+# Learns how many input tokens a frame costs from the usage Bedrock reports
+token_estimator = TokenEstimator()
+
+def build_payload(prompt, file_base64):
+    payload = {
+            "system" : [{"text": system_prompt }],
+            "messages":[{"role": "user", "content":[]}],
+            }
+    if PROMPT_CACHING:
+        payload["system"] += [{"text": prompt}, {"cachePoint": {"type": "default"}}]
+        prompt = "Analyze the images above as instructed."
+    for i, file in enumerate(file_base64):
+        payload["messages"][0]["content"].append(
+                        {
+                            "image": {
+                                "format":"jpeg",
+                                "source": {"bytes": file}
+                            }
+                        })
+        payload["messages"][0]["content"].append(
+                        {
+                            "text": f"Image {i}:"
+                        })
+    payload["messages"][0]["content"].append({"text": prompt})
+    # print("payload", payload)
+    return payload
+
+def claude_prompt_image(prompt, file_base64):
+    with stage_timer("bedrock"):
+        model_response = runtime.invoke_model(
+            modelId="us.amazon.nova-lite-v1:0",
+            body=json.dumps(build_payload(prompt, file_base64))
+        )
+        dict_response_body = json.loads(model_response.get("body").read())
+    return dict_response_body
+
+def stream_prompt_image(prompt, file_base64, on_field=None):
+    # Same request as claude_prompt_image, but fields of the JSON answer are
+    # passed to on_field(key, value) as soon as each one has streamed in
+    with stage_timer("bedrock"):
+        return _stream_prompt_image(prompt, file_base64, on_field)
+
+def _stream_prompt_image(prompt, file_base64, on_field):
+    start = time.perf_counter()
+    model_response = runtime.invoke_model_with_response_stream(
+        modelId="us.amazon.nova-lite-v1:0",
+        body=json.dumps(build_payload(prompt, file_base64))
+    )
+    parser = JSONFieldParser()
+    text = []
+    usage = {}
+    for event in model_response["body"]:
+        chunk = json.loads(event["chunk"]["bytes"])
+        if "contentBlockDelta" in chunk:
+            delta = chunk["contentBlockDelta"]["delta"].get("text", "")
+            text.append(delta)
+            for key, value in parser.feed(delta):
+                if key == "Emergency_Type":
+                    print(f"Emergency_Type {value!r} after {(time.perf_counter() - start) * 1000:.0f} ms")
+                if on_field is not None:
+                    on_field(key, value)
+        elif "metadata" in chunk:
+            usage = chunk["metadata"].get("usage", {})
+
+    # Shaped like the invoke_model body so callers handle both the same way
+    return {
+        "output": {"message": {"role": "assistant", "content": [{"text": "".join(text)}]}},
+        "usage": usage
+    }
+
+def image_process_llm(prompt, file_base64, gate=None, centroids=None, crowd_status=None, stream=None, on_field=None):
+    # With a per-camera gate, unchanged scenes reuse the last answer instead of calling the LLM
+    if gate is not None:
+        changed = [gate.changed(base64.b64decode(file), centroids, crowd_status) for file in file_base64]
+        if not any(changed) and gate.last_result is not None:
+            gate.suppress()
+            return gate.last_result
+
+    result = call_llm(prompt, file_base64, stream, on_field)
+    if gate is not None and result is not None:
+        # Only an answered frame becomes the gate's reference; if the call raised, the next frame retries
+        gate.commit()
+        gate.last_result = result
+    return result
+
+def call_llm(prompt, file_base64, stream=None, on_field=None):
+    key = content_key(system_prompt, prompt, *file_base64)
+    cached = llm_cache.get(key)
+    if cached is not None:
+        return cached
+
+    phash = None
+    if llm_cache.phash_distance:
+        phash = tuple(perceptual_hash_jpeg(base64.b64decode(file)) for file in file_base64)
+        cached = llm_cache.get_similar(phash, group=content_key(system_prompt, prompt))
+        if cached is not None:
+            return cached
+
+    frames = [frame_from_base64(file) for file in file_base64]
+    estimated_tokens = token_estimator.request_tokens([system_prompt, prompt], frames)
+
+    stream = STREAM_RESPONSES if stream is None else stream
+    if stream:
+        model_response = stream_prompt_image(prompt, file_base64, on_field)
+    else:
+        model_response = claude_prompt_image(prompt, file_base64)
+    print("model_response", model_response)
+    usage = model_response.get("usage", {})
+    input_tokens = usage.get("inputTokens", 0)
+    output_tokens = usage.get("outputTokens", 0)
+    cached_tokens = usage.get("cacheReadInputTokenCount", 0)
+    print(f"input tokens: estimated {estimated_tokens}, actual {input_tokens}, read from prompt cache {cached_tokens}")
+    token_estimator.observe([system_prompt, prompt], frames, input_tokens)
+    record_tokens(input_tokens, output_tokens)
+    # Raises LLMResponseError when the answer isn't a valid section response
+    with stage_timer("llm_parse"):
+        response_dict = parse_section_response(model_response["output"]["message"]["content"][0]["text"])
+    llm_cache.put(key, (input_tokens, output_tokens, response_dict), phash, group=content_key(system_prompt, prompt))
+    return input_tokens, output_tokens, response_dict
+    
+def image_to_base64(image_path):
+    # Downscaled and recompressed so the payload stays within the token budget
+    return prepare_frame(image_path).data
@@ -0,0 +1,94 @@
+import io
+import os
+import math
+import base64
+import threading
+from collections import namedtuple
+import numpy as np
+from PIL import Image
+
+# Frame size/quality and per-request ceilings (override with environment variables)
+MAX_IMAGE_SIDE = int(os.environ.get("BEDROCK_MAX_IMAGE_SIDE", "1024"))
+JPEG_QUALITY = int(os.environ.get("BEDROCK_JPEG_QUALITY", "80"))
+MAX_INPUT_TOKENS = int(os.environ.get("BEDROCK_MAX_INPUT_TOKENS", "12000"))
+MAX_PAYLOAD_BYTES = int(os.environ.get("BEDROCK_MAX_PAYLOAD_BYTES", str(20 * 1024 * 1024)))
+MAX_IMAGES_PER_REQUEST = int(os.environ.get("BEDROCK_MAX_IMAGES", "10"))
+# Starting estimate of image pixels per input token; refined from actual usage
+PIXELS_PER_TOKEN = float(os.environ.get("BEDROCK_PIXELS_PER_TOKEN", "750"))
+CHARS_PER_TOKEN = 4
+
+# A frame ready for the payload: base64 JPEG plus its size after downscaling
+Frame = namedtuple("Frame", ["data", "width", "height"])
+
+
+def prepare_frame(image, max_side=MAX_IMAGE_SIDE, quality=JPEG_QUALITY):
+    # Accepts JPEG bytes, a file path or a BGR array; returns a downscaled Frame
+    if isinstance(image, np.ndarray):
+        pil_image = Image.fromarray(image[:, :, ::-1])
+    else:
+        pil_image = Image.open(io.BytesIO(image) if isinstance(image, (bytes, bytearray)) else image)
+        # Let the JPEG decoder scale down by 1/2, 1/4 or 1/8 while decoding
+        pil_image.draft("RGB", (max_side, max_side))
+    pil_image = pil_image.convert("RGB")
+    pil_image.thumbnail((max_side, max_side))
+
+    buffer = io.BytesIO()
+    pil_image.save(buffer, format="JPEG", quality=quality)
+    return Frame(base64.b64encode(buffer.getvalue()).decode("utf-8"), pil_image.width, pil_image.height)
+
+
+def frame_from_base64(data):
+    # Wraps an already-encoded image; PIL only reads the header for its size
+    width, height = Image.open(io.BytesIO(base64.b64decode(data))).size
+    return Frame(data, width, height)
+
+
+def estimate_text_tokens(text):
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+class TokenEstimator:
+    # Estimates input tokens for a request and learns the pixels-per-token
+    # ratio from the usage.inputTokens the model reports back.
+
+    def __init__(self, pixels_per_token=PIXELS_PER_TOKEN, smoothing=0.2):
+        self.pixels_per_token = pixels_per_token
+        self.smoothing = smoothing
+        self._lock = threading.Lock()
+
+    def image_tokens(self, frame):
+        return math.ceil(frame.width * frame.height / self.pixels_per_token)
+
+    def request_tokens(self, texts, frames):
+        return sum(estimate_text_tokens(text) for text in texts) + sum(self.image_tokens(frame) for frame in frames)
+
+    def observe(self, texts, frames, input_tokens):
+        image_tokens = input_tokens - sum(estimate_text_tokens(text) for text in texts)
+        pixels = sum(frame.width * frame.height for frame in frames)
+        if image_tokens <= 0 or pixels == 0:
+            return
+        with self._lock:
+            observed = pixels / image_tokens
+            self.pixels_per_token += self.smoothing * (observed - self.pixels_per_token)
+
+
+def plan_batches(frames, texts, estimator, max_tokens=MAX_INPUT_TOKENS, max_bytes=MAX_PAYLOAD_BYTES,
+                 max_images=MAX_IMAGES_PER_REQUEST):
+    # Packs frames in order into as few requests as fit the token, byte and image ceilings
+    fixed_tokens = sum(estimate_text_tokens(text) for text in texts)
+    fixed_bytes = sum(len(text) for text in texts)
+    batches = []
+    batch, tokens, size = [], fixed_tokens, fixed_bytes
+    for frame in frames:
+        # Each image also carries a short "Image i:" label
+        frame_tokens = estimator.image_tokens(frame) + 4
+        frame_bytes = len(frame.data) + 64
+        if batch and (len(batch) >= max_images or tokens + frame_tokens > max_tokens or size + frame_bytes > max_bytes):
+            batches.append(batch)
+            batch, tokens, size = [], fixed_tokens, fixed_bytes
+        batch.append(frame)
+        tokens += frame_tokens
+        size += frame_bytes
+    if batch:
+        batches.append(batch)
+    return batches
@@ -0,0 +1,32 @@
+import cv2
+import numpy as np
+
+PERSON_CLASS = 0
+
+
+def extract_people(result):
+    # One device-to-host copy of the whole (n, 6) [x1, y1, x2, y2, conf, cls]
+    # tensor, then person boxes and integer centre points as arrays
+    if result.boxes is None:
+        return np.empty((0, 4), dtype=int), np.empty((0, 2), dtype=int), np.empty(0, dtype=np.float32)
+    data = result.boxes.data.cpu().numpy()
+    people = data[data[:, 5] == PERSON_CLASS]
+    boxes = people[:, :4].astype(int)
+    centroids = np.column_stack([(boxes[:, 0] + boxes[:, 2]) // 2, (boxes[:, 1] + boxes[:, 3]) // 2])
+    return boxes, centroids, people[:, 4]
+
+
+def draw_detections(image, detections):
+    boxes = np.asarray(detections["boxes"], dtype=np.int32).reshape(-1, 4)
+    if len(boxes):
+        # All rectangles in one call, as closed 4-point polygons
+        corners = boxes[:, [0, 1, 2, 1, 2, 3, 0, 3]].reshape(-1, 4, 2)
+        cv2.polylines(image, list(corners), True, (0, 255, 0), 2)
+
+    centroids = np.asarray(detections["centroids"], dtype=np.int32).reshape(-1, 2)
+    clustered = centroids[np.asarray(detections["cluster_labels"], dtype=int) != -1]
+    for x, y in clustered.tolist():
+        cv2.circle(image, (x, y), 10, (0, 0, 255), -1)
+
+    cv2.putText(image, detections["crowd_status"], (50, 50), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
+    return image
@@ -0,0 +1,159 @@
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+import cv2
+import numpy as np
+
+# Cache limits (override with environment variables)
+CACHE_MAX_ENTRIES = int(os.environ.get("RESULT_CACHE_MAX_ENTRIES", "1024"))
+CACHE_MAX_BYTES = int(os.environ.get("RESULT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+CACHE_TTL_SECONDS = float(os.environ.get("RESULT_CACHE_TTL_SECONDS", "300"))
+# Max differing bits between perceptual hashes of near-duplicates (0 disables the lookup)
+CACHE_PHASH_DISTANCE = int(os.environ.get("RESULT_CACHE_PHASH_DISTANCE", "0"))
+
+
+def content_key(*parts):
+    # Hash of the exact input bytes plus anything else that changes the result
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode("utf-8")
+        digest.update(len(part).to_bytes(8, "little"))
+        digest.update(part)
+    return digest.hexdigest()
+
+
+def file_content_key(file, *parts, chunk_size=1024 * 1024):
+    # Same as content_key for a file object, read in chunks and rewound afterwards
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode("utf-8")
+        digest.update(len(part).to_bytes(8, "little"))
+        digest.update(part)
+    file.seek(0)
+    for chunk in iter(lambda: file.read(chunk_size), b""):
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def perceptual_hash(image):
+    # 64-bit difference hash: similar frames differ in only a few bits
+    if image.ndim == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(image, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = np.packbits(small[:, 1:] > small[:, :-1])
+    return int.from_bytes(bits.tobytes(), "big")
+
+
+def perceptual_hash_jpeg(jpeg_bytes):
+    image = cv2.imdecode(np.frombuffer(jpeg_bytes, dtype=np.uint8), cv2.IMREAD_REDUCED_GRAYSCALE_8)
+    return perceptual_hash(image)
+
+
+def hash_distance(a, b):
+    # Works on single hashes or equal-length tuples of hashes (multi-image inputs)
+    if isinstance(a, tuple) or isinstance(b, tuple):
+        if not isinstance(a, tuple) or not isinstance(b, tuple) or len(a) != len(b):
+            return 64
+        return max((hash_distance(x, y) for x, y in zip(a, b)), default=0)
+    return bin(a ^ b).count("1")
+
+
+def estimate_size(value):
+    if isinstance(value, (bytes, bytearray, str)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(estimate_size(k) + estimate_size(v) for k, v in value.items()) + 64
+    if isinstance(value, (list, tuple)):
+        return sum(estimate_size(v) for v in value) + 56
+    return 32
+
+
+class ResultCache:
+    # LRU cache of computed results keyed by content hash, with a TTL and a cap
+    # on total size. Entries may carry a perceptual hash so a near-identical
+    # input from the same group can reuse the result.
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES,
+                 ttl=CACHE_TTL_SECONDS, phash_distance=CACHE_PHASH_DISTANCE):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.phash_distance = phash_distance
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _expired(self, entry, now):
+        return self.ttl > 0 and now - entry[1] > self.ttl
+
+    def _remove(self, key):
+        _, _, size, _, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry, time.monotonic()):
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def get_similar(self, phash, group=None):
+        # Called after get() missed; a match turns that miss into a near hit
+        if not self.phash_distance or phash is None:
+            return None
+        with self._lock:
+            now = time.monotonic()
+            best_key, best_distance = None, self.phash_distance + 1
+            for key, (_, created, _, entry_phash, entry_group) in self._entries.items():
+                if entry_phash is None or entry_group != group or self._expired((None, created), now):
+                    continue
+                distance = hash_distance(phash, entry_phash)
+                if distance < best_distance:
+                    best_key, best_distance = key, distance
+            if best_key is None:
+                return None
+            self._entries.move_to_end(best_key)
+            self.misses -= 1
+            self.near_hits += 1
+            return self._entries[best_key][0]
+
+    def put(self, key, value, phash=None, group=None, size=None):
+        size = estimate_size(value) if size is None else size
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, time.monotonic(), size, phash, group)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.near_hits + self.misses
+            return {
+                "hits": self.hits,
+                "near_hits": self.near_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.near_hits) / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes
+            }
@@ -0,0 +1,81 @@
+import os
+import sys
+import cv2
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+# No event files and no real AWS calls from the tests
+os.environ.setdefault("EVENT_STORE", "none")
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+
+class StubTensor:
+    def __init__(self, array):
+        self.array = array
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self.array
+
+
+class StubBoxes:
+    def __init__(self, data):
+        self.data = StubTensor(np.asarray(data, dtype=np.float32).reshape(-1, 6))
+
+
+class StubResult:
+    def __init__(self, data):
+        self.boxes = StubBoxes(data)
+
+
+class StubModel:
+    # Stands in for YOLO: every image gets the same boxes ([x1, y1, x2, y2, conf, cls] rows)
+
+    def __init__(self, data):
+        self.data = data
+        self.calls = 0
+
+    def __call__(self, images, **kwargs):
+        self.calls += 1
+        images = images if isinstance(images, list) else [images]
+        return [StubResult(self.data) for _ in images]
+
+
+def people_boxes(centres, size=20, cls=0):
+    return [[x - size, y - size, x + size, y + size, 0.9, cls] for x, y in centres]
+
+
+# Six people close together (one cluster), one far away and a non-person
+CROWD_BOXES = people_boxes([(100, 100), (130, 100), (100, 130), (130, 130), (115, 115), (145, 115), (900, 900)]) \
+    + people_boxes([(500, 500)], cls=2)
+
+
+def jpeg_bytes(width=64, height=48, seed=0):
+    image = np.random.default_rng(seed).integers(0, 255, (height, width, 3), dtype=np.uint8)
+    return cv2.imencode(".jpg", image)[1].tobytes()
+
+
+@pytest.fixture
+def stub_model():
+    return StubModel(CROWD_BOXES)
+
+
+@pytest.fixture
+def ready_service(monkeypatch, stub_model):
+    # The detection services' model service, ready and backed by the stub model
+    from model_service import service
+    monkeypatch.setattr(service, "ready", lambda: True)
+    monkeypatch.setattr(service, "predict", lambda image: stub_model(image)[0])
+    return service
+
+
+def counter_value(counter, *labels):
+    return counter._values.get(tuple(labels), 0)
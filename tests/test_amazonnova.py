@@ -0,0 +1,206 @@
+import io
+import json
+import time
+import base64
+import random
+from functools import partial
+from types import SimpleNamespace
+import cv2
+import numpy as np
+import pytest
+from botocore.exceptions import ClientError
+from fake_bedrock import FakeRuntime
+
+import amazonnova
+from change_gate import ChangeGate
+from payload_builder import plan_batches
+
+LEVELS = list(range(0, 240, 20))
+
+
+def grey_frame(level):
+    return cv2.imencode(".jpg", np.full((48, 64, 3), level, dtype=np.uint8))[1].tobytes()
+
+
+class EchoRuntime(FakeRuntime):
+    # Answers with what it was sent, so the final summary shows the order the
+    # frames were merged in. Calls take a random time, so batches finish out of order.
+
+    def __init__(self, **kwargs):
+        super().__init__(latency=0, **kwargs)
+        self.jitter = random.Random(1)
+
+    def invoke_model(self, modelId, body):
+        time.sleep(self.jitter.uniform(0, 0.03))
+        self._respond(body, "InvokeModel")
+        content = json.loads(body)["messages"][0]["content"]
+        images = [part["image"]["source"]["bytes"] for part in content if "image" in part]
+        prompt = content[-1]["text"]
+        if images:
+            # Each frame is a flat grey image; its level identifies it
+            levels = [int(round(cv2.imdecode(np.frombuffer(base64.b64decode(image), np.uint8),
+                                             cv2.IMREAD_GRAYSCALE).mean() / 20) * 20) for image in images]
+            text = json.dumps({"frames": levels})
+        elif prompt.startswith(amazonnova.merge_prompt):
+            summaries = json.loads(prompt.splitlines()[-1])
+            text = json.dumps({"frames": [level for summary in summaries for level in summary["frames"]]})
+        else:
+            text = json.dumps(json.JSONDecoder().raw_decode(prompt[prompt.index("{"):])[0])
+        response = {"output": {"message": {"content": [{"text": text}]}},
+                    "usage": {"inputTokens": 100, "outputTokens": len(text) // 4}}
+        return {"body": io.BytesIO(json.dumps(response).encode("utf-8"))}
+
+
+class FlakyRuntime(FakeRuntime):
+    # Fails the first `failures` calls with the given error code
+
+    def __init__(self, failures, code="ThrottlingException"):
+        super().__init__(latency=0)
+        self.failures = failures
+        self.code = code
+
+    def invoke_model(self, modelId, body):
+        with self._lock:
+            fail = self.failures > 0
+            self.failures -= fail
+            self.calls += fail
+        if fail:
+            raise ClientError({"Error": {"Code": self.code, "Message": "Too many requests"}}, "InvokeModel")
+        return super().invoke_model(modelId, body)
+
+
+@pytest.fixture
+def small_batches(monkeypatch):
+    # Two frames per request, so a dozen frames make a two-level merge tree
+    monkeypatch.setattr(amazonnova, "plan_batches", partial(plan_batches, max_images=2))
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    # Backoff waits are recorded instead of slept; the fake's own sleeps are untouched
+    delays = []
+    monkeypatch.setattr(amazonnova, "time", SimpleNamespace(sleep=delays.append))
+    return delays
+
+
+def test_summary_keeps_video_order_under_concurrency(monkeypatch, small_batches):
+    fake = EchoRuntime()
+    monkeypatch.setattr(amazonnova, "runtime", fake)
+
+    summary = amazonnova.process_video_frames([grey_frame(level) for level in LEVELS], max_in_flight=4, gate=False)
+
+    assert json.loads(summary) == {"frames": LEVELS}
+    # 6 batches, 2 merges of the first level and 1 of the second, then the final prompt
+    assert fake.calls == 6 + 2 + 1 + 1
+
+
+@pytest.mark.parametrize("max_in_flight", [1, 3])
+def test_requests_in_flight_never_exceed_the_cap(monkeypatch, small_batches, max_in_flight):
+    fake = FakeRuntime(latency=0.02)
+    monkeypatch.setattr(amazonnova, "runtime", fake)
+
+    amazonnova.process_video_frames([grey_frame(level) for level in LEVELS * 3], max_in_flight=max_in_flight, gate=False)
+
+    assert fake.max_in_flight == max_in_flight
+
+
+def test_throttled_request_is_retried_with_jitter(monkeypatch, sleeps):
+    fake = FlakyRuntime(failures=3)
+    monkeypatch.setattr(amazonnova, "runtime", fake)
+
+    response = amazonnova.claude_prompt_image("Describe the frame.", [])
+
+    assert response["output"]["message"]["content"][0]["text"] == fake.text
+    assert fake.calls == 4
+    # Full jitter: each wait is somewhere below the doubling backoff ceiling
+    assert len(sleeps) == 3
+    assert all(0 <= delay <= 0.5 * 2 ** attempt for attempt, delay in enumerate(sleeps))
+
+
+def test_throttling_gives_up_after_max_retries(monkeypatch, sleeps):
+    fake = FlakyRuntime(failures=100)
+    monkeypatch.setattr(amazonnova, "runtime", fake)
+
+    with pytest.raises(ClientError):
+        amazonnova.invoke_with_retry("{}", max_retries=2)
+    assert (fake.calls, len(sleeps)) == (3, 2)
+    # The caller logs the failure and gets no response
+    assert amazonnova.claude_prompt_image("Describe the frame.", []) is None
+
+
+def test_other_errors_are_not_retried(monkeypatch, sleeps):
+    fake = FlakyRuntime(failures=1, code="ValidationException")
+    monkeypatch.setattr(amazonnova, "runtime", fake)
+
+    assert amazonnova.claude_prompt_image("Describe the frame.", []) is None
+    assert (fake.calls, sleeps) == (1, [])
+
+
+def test_gate_accepts_frame_files(monkeypatch, tmp_path):
+    fake = FakeRuntime(latency=0)
+    monkeypatch.setattr(amazonnova, "runtime", fake)
+    paths = []
+    for i, level in enumerate([0, 0, 0, 200, 200]):
+        path = tmp_path / f"frame_{i}.jpg"
+        path.write_bytes(grey_frame(level))
+        paths.append(str(path) if i % 2 else path)
+
+    gate = ChangeGate()
+    amazonnova.process_video_frames(paths, gate=gate)
+
+    # Paths are gated like JPEG buffers: only the two distinct scenes reach the model
+    assert (gate.escalated, gate.suppressed) == (2, 3)
+    assert fake.calls == 2
+
+
+class NoUsageRuntime(FakeRuntime):
+    def invoke_model(self, modelId, body):
+        response = json.loads(super().invoke_model(modelId, body)["body"].read())
+        del response["usage"]
+        return {"body": io.BytesIO(json.dumps(response).encode("utf-8"))}
+
+
+def test_reply_without_usage_is_kept(monkeypatch):
+    fake = NoUsageRuntime(latency=0)
+    monkeypatch.setattr(amazonnova, "runtime", fake)
+
+    response = amazonnova.claude_prompt_image("Describe the frame.", [])
+    assert response["output"]["message"]["content"][0]["text"] == fake.text
+
+    batch = [amazonnova.prepare_frame(grey_frame(0))]
+    assert amazonnova.summarize_batch(1, 1, batch) == json.loads(fake.text)
+
+
+# The real class, kept before the tests patch cv2.VideoCapture
+VideoCapture = cv2.VideoCapture
+
+
+class ShortCountCapture:
+    # Containers often report an estimated frame count; this one undercounts
+
+    def __init__(self, *args):
+        self.capture = VideoCapture(*args)
+
+    def __getattr__(self, name):
+        return getattr(self.capture, name)
+
+    def get(self, prop):
+        value = self.capture.get(prop)
+        return value // 2 if prop == cv2.CAP_PROP_FRAME_COUNT else value
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_extraction_reads_to_end_of_file(monkeypatch, tmp_path, workers):
+    path = str(tmp_path / "clip.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 10, (64, 48))
+    for i in range(40):
+        writer.write(np.full((48, 64, 3), i * 6, dtype=np.uint8))
+    writer.release()
+    monkeypatch.setattr(cv2, "VideoCapture", ShortCountCapture)
+    monkeypatch.setattr(amazonnova, "MIN_SEGMENT_FRAMES", 5)
+
+    frames = amazonnova.extract_frames(path, frame_interval=3, workers=workers)
+
+    levels = [cv2.imdecode(np.frombuffer(frame, np.uint8), cv2.IMREAD_GRAYSCALE).mean() for frame in frames]
+    assert len(frames) == len(range(0, 40, 3))
+    assert abs(levels[-1] - 39 * 6) < 3
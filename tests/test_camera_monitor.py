@@ -0,0 +1,205 @@
+import json
+import time
+import threading
+from types import SimpleNamespace
+import pytest
+from conftest import jpeg_bytes
+from fake_bedrock import FakeRuntime
+
+import camera_monitor
+import nova_llm
+from camera_monitor import Camera, CameraMonitor, RateLimiter
+from result_cache import ResultCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+class RecordingPool:
+    # Holds submitted camera runs until the test finishes them
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, fn, camera):
+        self.submitted.append((fn, camera))
+
+    def finish(self, camera_id=None):
+        index = 0 if camera_id is None else [camera.camera_id for _, camera in self.submitted].index(camera_id)
+        fn, camera = self.submitted.pop(index)
+        fn(camera)
+        return camera.camera_id
+
+
+def answers(**emergency_types):
+    # A fake analyze(): each camera classifies as given, Non-Emergency otherwise
+    def analyze(camera):
+        emergency_type = emergency_types.get(camera.camera_id, "Non-Emergency")
+        return 100, 10, {"Emergency_Type": emergency_type, "situation": f"{camera.camera_id} is {emergency_type}"}
+    return analyze
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(camera_monitor, "time", SimpleNamespace(monotonic=clock.monotonic))
+    return clock
+
+
+def make_monitor(analyze, workers=1, rate_per_minute=6000):
+    monitor = CameraMonitor(workers=workers, rate_per_minute=rate_per_minute, analyze=analyze)
+    monitor._pool = RecordingPool()
+    return monitor
+
+
+def submitted(monitor):
+    return [camera.camera_id for _, camera in monitor._pool.submitted]
+
+
+def test_alerts_are_dispatched_first(clock):
+    monitor = make_monitor(answers())
+    for camera_id, emergency_type in [("calm", None), ("potential", "Potential Emergency"), ("emergency", "Emergency"),
+                                      ("quiet", "Non-Emergency")]:
+        camera = Camera(camera_id, "General Ward", "frame.jpg")
+        camera.emergency_type = emergency_type
+        monitor.add_camera(camera)
+
+    order = []
+    monitor._dispatch(clock.now)
+    while monitor._pool.submitted:
+        order.append(monitor._pool.finish())
+        monitor._dispatch(clock.now)
+    # Equal priorities keep the order the cameras became due
+    assert order == ["emergency", "potential", "calm", "quiet"]
+
+
+@pytest.mark.parametrize("emergency_type, interval", [("Emergency", 15), ("Potential Emergency", 30),
+                                                      ("Non-Emergency", 60)])
+def test_alerts_come_back_sooner(clock, emergency_type, interval):
+    monitor = make_monitor(answers(ward=emergency_type))
+    monitor.add_camera(Camera("ward", "General Ward", "frame.jpg"))
+    monitor._dispatch(clock.now)
+    monitor._pool.finish()
+
+    camera = monitor.cameras["ward"]
+    assert (camera.emergency_type, camera.runs, camera.last_error) == (emergency_type, 1, None)
+    # Nothing is due until the (shortened) interval has passed
+    assert monitor._dispatch(clock.now) == interval
+    clock.now += interval - 0.1
+    assert monitor._dispatch(clock.now) == pytest.approx(0.1)
+    assert submitted(monitor) == []
+    clock.now += 0.1
+    monitor._dispatch(clock.now)
+    assert submitted(monitor) == ["ward"]
+
+
+def test_in_flight_cap(clock):
+    monitor = make_monitor(answers(), workers=2)
+    for i in range(5):
+        monitor.add_camera(Camera(f"cam{i}", "ICU", "frame.jpg"))
+
+    monitor._dispatch(clock.now)
+    assert submitted(monitor) == ["cam0", "cam1"]
+    # Still full: the scheduler sleeps until a finished run wakes it, not on a timer
+    assert monitor._dispatch(clock.now) is None
+    assert len(submitted(monitor)) == 2
+
+    monitor._pool.finish("cam1")
+    monitor._dispatch(clock.now)
+    assert submitted(monitor) == ["cam0", "cam2"]
+
+
+def test_camera_in_flight_is_not_dispatched_twice(clock):
+    monitor = make_monitor(answers(), workers=2)
+    monitor.add_camera(Camera("ward", "ICU", "frame.jpg", interval=1))
+    monitor._dispatch(clock.now)
+    # Its next run is only scheduled once the current one finishes
+    clock.now += 10
+    monitor._dispatch(clock.now)
+    assert submitted(monitor) == ["ward"]
+
+
+def test_rate_limit_is_shared_by_all_cameras(clock):
+    monitor = make_monitor(answers(), workers=4, rate_per_minute=6)
+    monitor.add_camera(Camera("a", "ICU", "frame.jpg"))
+    monitor.add_camera(Camera("b", "ICU", "frame.jpg"))
+
+    # One call every 10 seconds, with a burst of one
+    assert monitor._dispatch(clock.now) == pytest.approx(10)
+    assert submitted(monitor) == ["a"]
+    clock.now += 10
+    monitor._dispatch(clock.now)
+    assert submitted(monitor) == ["a", "b"]
+
+
+def test_rate_limiter_refills():
+    limiter = RateLimiter(rate_per_minute=60, burst=2)
+    assert limiter.try_acquire(limiter.updated) and limiter.try_acquire(limiter.updated)
+    assert not limiter.try_acquire(limiter.updated)
+    assert limiter.wait_time(limiter.updated + 0.25) == pytest.approx(0.75)
+    assert limiter.try_acquire(limiter.updated + 0.75)
+
+
+def test_failed_analysis_keeps_the_last_answer(clock):
+    def analyze(camera):
+        raise RuntimeError("model unavailable")
+
+    monitor = make_monitor(analyze)
+    camera = Camera("ward", "ICU", "frame.jpg")
+    camera.emergency_type = "Emergency"
+    monitor.add_camera(camera)
+    monitor._dispatch(clock.now)
+    monitor._pool.finish()
+
+    assert (camera.errors, camera.last_error, camera.emergency_type) == (1, "model unavailable", "Emergency")
+    # Still rescheduled at the emergency interval
+    assert monitor._dispatch(clock.now) == 15 * 0.25
+
+
+def test_worker_threads_respect_the_cap():
+    lock = threading.Lock()
+    state = {"in_flight": 0, "peak": 0, "calls": 0}
+
+    def analyze(camera):
+        with lock:
+            state["in_flight"] += 1
+            state["calls"] += 1
+            state["peak"] = max(state["peak"], state["in_flight"])
+        time.sleep(0.02)
+        with lock:
+            state["in_flight"] -= 1
+        return None
+
+    monitor = CameraMonitor(workers=2, rate_per_minute=60000, analyze=analyze)
+    for i in range(6):
+        monitor.add_camera(Camera(f"cam{i}", "ICU", "frame.jpg", interval=0.01))
+    monitor.start()
+    time.sleep(0.3)
+    monitor.stop()
+
+    assert state["peak"] == 2
+    assert state["calls"] > 6
+
+
+def test_invalid_streamed_classification_is_ignored(monkeypatch, clock):
+    monkeypatch.setattr(nova_llm, "STREAM_RESPONSES", True)
+    monkeypatch.setattr(nova_llm, "llm_cache", ResultCache(max_entries=0))
+    monkeypatch.setattr(nova_llm, "runtime", FakeRuntime(latency=0, text=json.dumps(
+        {"Emergency_Type": "Critical", "situation": "A patient has collapsed."})))
+    monitor = make_monitor(camera_monitor.analyze_camera)
+    camera = Camera("ward", "ICU", jpeg_bytes)
+    camera.emergency_type = "Potential Emergency"
+    monitor.add_camera(camera)
+    monitor._dispatch(clock.now)
+    monitor._pool.finish()
+
+    # The answer fails validation, so the last valid classification stands
+    assert camera.errors == 1 and "schema" in camera.last_error
+    assert (camera.emergency_type, camera.priority()) == ("Potential Emergency", 1)
+
+    camera.on_field("Emergency_Type", "Emergency")
+    assert camera.emergency_type == "Emergency"
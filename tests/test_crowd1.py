@@ -0,0 +1,21 @@
+from fastapi.testclient import TestClient
+from conftest import counter_value, jpeg_bytes
+
+import crowd1
+import metrics
+from result_cache import ResultCache
+
+
+def test_cache_hits_are_counted(monkeypatch, ready_service, stub_model):
+    monkeypatch.setattr(crowd1, "result_cache", ResultCache())
+    api = TestClient(crowd1.app)
+    people, crowds = counter_value(metrics.PEOPLE_DETECTED), counter_value(metrics.CROWD_STATUS, "Crowd")
+
+    for _ in range(2):
+        response = api.post("/detect-crowd?format=json", files={"file": ("a.jpg", jpeg_bytes(), "image/jpeg")})
+        assert response.json()["people_count"] == 7
+
+    # The second request is served from the cache but still counted
+    assert stub_model.calls == 1
+    assert counter_value(metrics.PEOPLE_DETECTED) - people == 14
+    assert counter_value(metrics.CROWD_STATUS, "Crowd") - crowds == 2
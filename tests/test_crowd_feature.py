@@ -0,0 +1,145 @@
+import boto3
+import pytest
+from moto import mock_aws
+from fastapi.testclient import TestClient
+from conftest import counter_value, jpeg_bytes
+
+import crowd_feature
+import metrics
+from result_cache import ResultCache
+
+BUCKET = "cameras"
+
+
+@pytest.fixture
+def s3(monkeypatch, ready_service):
+    with mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket=BUCKET)
+        monkeypatch.setattr(crowd_feature, "s3_client", client)
+        monkeypatch.setattr(crowd_feature, "result_cache", ResultCache(max_entries=0))
+        yield client
+
+
+@pytest.fixture
+def api():
+    return TestClient(crowd_feature.app)
+
+
+def put_images(s3, keys):
+    for seed, key in enumerate(keys):
+        s3.put_object(Bucket=BUCKET, Key=key, Body=jpeg_bytes(seed=seed))
+
+
+def keys_in(s3, prefix=""):
+    response = s3.list_objects_v2(Bucket=BUCKET, Prefix=prefix)
+    return sorted(obj["Key"] for obj in response.get("Contents", []))
+
+
+def test_batch_explicit_keys(s3, api):
+    put_images(s3, ["cam/original/a.jpg", "cam/original/b.jpg"])
+    response = api.post("/detect-crowd/batch", json={"bucket": BUCKET, "files": ["cam/original/a.jpg", "cam/original/b.jpg"]})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["total"], body["succeeded"], body["failed"]) == (2, 2, 0)
+    assert [result["processed_file"] for result in body["results"]] == ["cam/processed/a.jpg", "cam/processed/b.jpg"]
+    assert all(result["crowd_status"] == "Crowd" for result in body["results"])
+    assert keys_in(s3, "cam/processed/") == ["cam/processed/a.jpg", "cam/processed/b.jpg"]
+
+
+def test_batch_prefix_respects_max_keys(s3, api):
+    put_images(s3, [f"cam/original/{i}.jpg" for i in range(3)] + ["other/original/x.jpg"])
+    response = api.post("/detect-crowd/batch", json={"bucket": BUCKET, "prefix": "cam/original/", "max_keys": 2})
+
+    body = response.json()
+    assert body["total"] == 2
+    assert [result["file"] for result in body["results"]] == ["cam/original/0.jpg", "cam/original/1.jpg"]
+
+
+def test_batch_prefix_and_files_are_deduplicated(s3, api):
+    put_images(s3, ["cam/original/a.jpg", "cam/original/b.jpg"])
+    response = api.post("/detect-crowd/batch", json={"bucket": BUCKET, "files": ["cam/original/a.jpg"],
+                                                     "prefix": "cam/original/"})
+
+    assert [result["file"] for result in response.json()["results"]] == ["cam/original/a.jpg", "cam/original/b.jpg"]
+
+
+def test_batch_partial_failure(s3, api):
+    put_images(s3, ["cam/original/good.jpg", "cam/unsafe.jpg"])
+    s3.put_object(Bucket=BUCKET, Key="cam/original/broken.jpg", Body=b"not an image")
+    files = ["cam/original/good.jpg", "cam/original/broken.jpg", "cam/original/missing.jpg", "cam/unsafe.jpg"]
+    response = api.post("/detect-crowd/batch", json={"bucket": BUCKET, "files": files})
+
+    body = response.json()
+    assert (body["total"], body["succeeded"], body["failed"]) == (4, 1, 3)
+    results = {result["file"]: result for result in body["results"]}
+    assert "error" not in results["cam/original/good.jpg"]
+    assert all("error" in results[key] for key in files[1:])
+    # A key without "original" is never overwritten
+    assert "overwrite" in results["cam/unsafe.jpg"]["error"]
+    assert keys_in(s3, "cam/processed/") == ["cam/processed/good.jpg"]
+
+
+def test_batch_json_skips_upload(s3, api):
+    put_images(s3, ["cam/original/a.jpg", "cam/unsafe.jpg"])
+    response = api.post("/detect-crowd/batch", json={"bucket": BUCKET, "files": ["cam/original/a.jpg", "cam/unsafe.jpg"],
+                                                     "response_format": "json"})
+
+    body = response.json()
+    assert body["succeeded"] == 2
+    for result in body["results"]:
+        assert (result["people_count"], result["cluster_count"]) == (7, 1)
+        assert len(result["boxes"]) == len(result["centroids"]) == 7
+        assert "processed_file" not in result
+    assert keys_in(s3, "cam/processed/") == []
+
+
+def test_batch_requires_keys(s3, api):
+    response = api.post("/detect-crowd/batch", json={"bucket": BUCKET, "prefix": "nothing/"})
+    assert response.status_code == 400
+
+
+def test_single_uploads_next_to_original(s3, api):
+    put_images(s3, ["cam/original/a.jpg"])
+    response = api.post("/detect-crowd", json={"bucket": BUCKET, "file": "cam/original/a.jpg"})
+
+    assert response.status_code == 200
+    assert response.json()["crowd_status"] == "Crowd"
+    assert keys_in(s3) == ["cam/original/a.jpg", "cam/processed/a.jpg"]
+
+
+def test_single_refuses_to_overwrite_input(s3, api):
+    original = jpeg_bytes(seed=7)
+    s3.put_object(Bucket=BUCKET, Key="cam/a.jpg", Body=original)
+    response = api.post("/detect-crowd", json={"bucket": BUCKET, "file": "cam/a.jpg"})
+
+    assert response.status_code == 400
+    assert s3.get_object(Bucket=BUCKET, Key="cam/a.jpg")["Body"].read() == original
+    # JSON responses upload nothing, so any key is fine
+    response = api.post("/detect-crowd", json={"bucket": BUCKET, "file": "cam/a.jpg", "response_format": "json"})
+    assert response.status_code == 200
+    assert response.json()["people_count"] == 7
+
+
+def test_requests_wait_for_the_model(monkeypatch, api):
+    from model_service import service
+    monkeypatch.setattr(service, "ready", lambda: False)
+    response = api.post("/detect-crowd/batch", json={"bucket": BUCKET, "files": ["cam/original/a.jpg"]})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "5"
+
+
+def test_cache_hits_are_counted(s3, api, monkeypatch, stub_model):
+    monkeypatch.setattr(crowd_feature, "result_cache", ResultCache())
+    put_images(s3, ["cam/original/a.jpg"])
+    people, crowds = counter_value(metrics.PEOPLE_DETECTED), counter_value(metrics.CROWD_STATUS, "Crowd")
+
+    for _ in range(2):
+        response = api.post("/detect-crowd", json={"bucket": BUCKET, "file": "cam/original/a.jpg", "response_format": "json"})
+        assert response.json()["people_count"] == 7
+
+    # The second request is served from the cache but still counted
+    assert stub_model.calls == 1
+    assert counter_value(metrics.PEOPLE_DETECTED) - people == 14
+    assert counter_value(metrics.CROWD_STATUS, "Crowd") - crowds == 2
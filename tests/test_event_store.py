@@ -0,0 +1,84 @@
+import pytest
+from moto import mock_aws
+
+from event_store import DynamoDBBackend, EventWriter, SQLiteBackend, make_event
+
+# Real epoch timestamps, on a 5 minute bucket boundary; their sort keys are as wide as the key format allows
+T0 = 1_760_000_100.0
+
+
+def events():
+    return [
+        make_event("detection", "cam1", timestamp=T0, crowd_status="Crowd", people_count=7, cluster_count=1),
+        make_event("detection", "cam1", timestamp=T0, crowd_status="No Crowd", people_count=2, cluster_count=0),
+        make_event("classification", "cam1", timestamp=T0 + 100, emergency_type="Emergency",
+                   input_tokens=900, output_tokens=40),
+        make_event("zone", "cam1", timestamp=T0 + 400, people_count=3, zone="door"),
+        make_event("detection", "cam2", timestamp=T0 + 200, crowd_status="Crowd", people_count=9, cluster_count=2),
+    ]
+
+
+@pytest.fixture(params=["sqlite", "dynamodb"])
+def backend(request, tmp_path):
+    if request.param == "sqlite":
+        backend = SQLiteBackend(str(tmp_path / "events.db"))
+        backend.write_batch(events())
+        yield backend
+        backend.close()
+    else:
+        with mock_aws():
+            backend = DynamoDBBackend(table_name="events")
+            backend.create_table()
+            backend.write_batch(events())
+            yield backend
+
+
+def timestamps(rows):
+    return [row["timestamp"] for row in rows]
+
+
+def test_query_without_end(backend):
+    rows = backend.query("cam1")
+    assert timestamps(rows) == [T0, T0, T0 + 100, T0 + 400]
+    assert sorted(row["people_count"] or 0 for row in rows) == [0, 2, 3, 7]
+    assert timestamps(backend.query("cam1", start=T0 + 100)) == [T0 + 100, T0 + 400]
+
+
+def test_query_with_end_excludes_it(backend):
+    assert timestamps(backend.query("cam1", end=T0 + 400)) == [T0, T0, T0 + 100]
+    assert timestamps(backend.query("cam1", start=T0 + 1, end=T0 + 400)) == [T0 + 100]
+
+
+def test_query_every_camera(backend):
+    assert timestamps(backend.query()) == [T0, T0, T0 + 100, T0 + 200, T0 + 400]
+    assert timestamps(backend.query(end=T0 + 200)) == [T0, T0, T0 + 100]
+    assert [row["camera_id"] for row in backend.query(kind="detection", start=T0 + 1)] == ["cam2"]
+
+
+def test_query_filters_and_limit(backend):
+    assert [row["zone"] for row in backend.query("cam1", zone="door")] == ["door"]
+    assert [row["emergency_type"] for row in backend.query("cam1", kind="classification")] == ["Emergency"]
+    assert len(backend.query(limit=2)) == 2
+
+
+def test_rollup(backend):
+    rows = backend.rollup("cam1", bucket_seconds=300)
+    assert [(row["zone"], row["bucket_start"], row["events"]) for row in rows] == [
+        (None, T0 // 300 * 300, 3), ("door", (T0 + 400) // 300 * 300, 1)]
+    first = rows[0]
+    assert (first["peak_people"], first["peak_clusters"], first["crowd_events"], first["emergencies"]) == (7, 1, 1, 1)
+    assert (first["input_tokens"], first["output_tokens"]) == (900, 40)
+
+    assert [row["camera_id"] for row in backend.rollup(bucket_seconds=300)] == ["cam1", "cam1", "cam2"]
+    assert sum(row["events"] for row in backend.rollup("cam1", end=T0 + 400, bucket_seconds=300)) == 3
+
+
+def test_writer_flushes_on_close(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "events.db"))
+    writer = EventWriter(backend, batch_size=2, flush_interval=60)
+    for event in events():
+        writer.record(event)
+    writer.close()
+
+    assert writer.stats() == {"written": 5, "dropped": 0, "failed": 0, "queued": 0}
+    assert len(SQLiteBackend(backend.path).query()) == 5
@@ -0,0 +1,83 @@
+import json
+import pytest
+
+from llm_response import JSONFieldParser, LLMResponseError, parse_json_object, parse_section_response
+
+REPLY = {
+    "Emergency_Type": "Potential Emergency",
+    "situation": "A nurse says \"wait\" \\ a patient\nwaves {not json} [either], and leaves.",
+    "people": [{"role": "nurse", "ids": [1, 2]}, {"role": "patient", "ids": []}],
+    "count": 3,
+    "score": -0.5e1,
+    "stable": True,
+    "alarm": False,
+    "notes": None,
+}
+
+
+def fields_in_order(text, chunk_size):
+    parser = JSONFieldParser()
+    completed = []
+    for start in range(0, len(text), chunk_size):
+        completed += parser.feed(text[start:start + chunk_size])
+    return parser, completed
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 10_000])
+def test_fields_complete_as_they_stream(chunk_size):
+    text = "```json\n" + json.dumps(REPLY, indent=2) + "\n```\nThat is all."
+    parser, completed = fields_in_order(text, chunk_size)
+
+    assert parser.done
+    assert completed == list(REPLY.items())
+    assert parser.fields == REPLY
+
+
+def test_field_is_emitted_before_the_object_ends():
+    parser = JSONFieldParser()
+    assert parser.feed('{"Emergency_Type": "Emergency", "situation": "A patient has coll') == [("Emergency_Type", "Emergency")]
+    assert not parser.done
+    assert parser.feed('apsed."}') == [("situation", "A patient has collapsed.")]
+    assert parser.done
+
+
+def test_scalar_fields_end_at_comma_or_brace():
+    parser = JSONFieldParser()
+    assert parser.feed('{"count": 12') == []
+    assert parser.feed(', "ratio": 0.25}') == [("count", 12), ("ratio", 0.25)]
+
+
+def test_only_the_first_object_is_read():
+    assert parse_json_object('Sure! {"a": {"b": "}"}} and {"c": 1}') == {"a": {"b": "}"}}
+
+
+def test_alias_is_mapped_to_the_schema_field():
+    text = '{"situation": "Quiet ward.", "Emergency Type": "Non-Emergency"}'
+    assert parse_section_response(text) == {"situation": "Quiet ward.", "Emergency_Type": "Non-Emergency"}
+
+
+def test_raw_newlines_inside_strings_are_accepted():
+    assert parse_json_object('{"situation": "line one\nline two"}') == {"situation": "line one\nline two"}
+
+
+def test_escaped_quotes_fall_back_to_unescaping():
+    text = '{\\"situation\\": \\"A visitor is sitting calmly.\\", \\"Emergency_Type\\": \\"Non-Emergency\\"}'
+    assert parse_section_response(text) == {"situation": "A visitor is sitting calmly.", "Emergency_Type": "Non-Emergency"}
+
+
+def test_incomplete_object_is_an_error():
+    with pytest.raises(LLMResponseError) as error:
+        parse_json_object('```json\n{"situation": "cut off')
+    assert error.value.raw_text == '```json\n{"situation": "cut off'
+
+
+def test_invalid_value_is_an_error():
+    with pytest.raises(LLMResponseError):
+        parse_json_object('{"count": twelve}')
+
+
+def test_schema_mismatch_is_an_error():
+    with pytest.raises(LLMResponseError):
+        parse_section_response('{"situation": "Busy.", "Emergency_Type": "Maybe"}')
+    with pytest.raises(LLMResponseError):
+        parse_section_response('{"Emergency_Type": "Emergency"}')
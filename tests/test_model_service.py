@@ -0,0 +1,44 @@
+import threading
+
+import model_service
+from model_service import ModelService
+
+
+def loaded_on(monkeypatch, workers):
+    # Records the thread that loads the model and the one that would fork the pool
+    threads = {}
+
+    def load_model(profile):
+        threads["load"] = threading.current_thread()
+        return object()
+
+    def start_model_pool(model, **kwargs):
+        threads["pool"] = threading.current_thread()
+        return model
+
+    monkeypatch.setattr(model_service, "MODEL_WORKERS", workers)
+    monkeypatch.setattr(model_service, "load_model", load_model)
+    monkeypatch.setattr(model_service, "start_model_pool", start_model_pool)
+    monkeypatch.setattr(model_service, "warm_up", lambda model, **kwargs: None)
+    return threads
+
+
+def test_worker_pool_is_forked_on_the_calling_thread(monkeypatch):
+    threads = loaded_on(monkeypatch, workers=2)
+    service = ModelService()
+
+    # Ready as soon as start() returns: nothing ran in the background
+    assert service.start().ready()
+    assert threads["load"] is threads["pool"] is threading.current_thread()
+    # Starting again does not load a second time
+    del threads["load"]
+    assert service.start().ready() and "load" not in threads
+
+
+def test_without_workers_the_model_loads_in_the_background(monkeypatch):
+    threads = loaded_on(monkeypatch, workers=0)
+    service = ModelService().start()
+
+    assert service.wait(5)
+    assert threads["load"].name == "model-loader"
+    assert "pool" not in threads
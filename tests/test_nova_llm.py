@@ -0,0 +1,63 @@
+import base64
+import json
+import cv2
+import numpy as np
+import pytest
+from botocore.exceptions import ClientError
+from conftest import jpeg_bytes
+from fake_bedrock import FakeRuntime
+
+import nova_llm
+from change_gate import ChangeGate
+from result_cache import ResultCache
+
+
+class NoMetadataRuntime(FakeRuntime):
+    # Streams the answer but never sends the closing metadata event with usage
+    def _events(self, response):
+        for event in super()._events(response):
+            if b"metadata" not in event["chunk"]["bytes"]:
+                yield event
+
+
+def test_answer_without_usage_is_kept(monkeypatch):
+    fake = NoMetadataRuntime(latency=0)
+    monkeypatch.setattr(nova_llm, "runtime", fake)
+    monkeypatch.setattr(nova_llm, "llm_cache", ResultCache(max_entries=0))
+    frame = base64.b64encode(jpeg_bytes()).decode("utf-8")
+
+    input_tokens, output_tokens, response = nova_llm.call_llm("Describe the ward.", [frame], stream=True)
+
+    assert (input_tokens, output_tokens) == (0, 0)
+    assert response == json.loads(fake.text)
+
+
+def grey_frame(level):
+    return base64.b64encode(cv2.imencode(".jpg", np.full((48, 64, 3), level, dtype=np.uint8))[1]).decode("utf-8")
+
+
+def test_failed_call_does_not_move_the_gate(monkeypatch):
+    monkeypatch.setattr(nova_llm, "llm_cache", ResultCache(max_entries=0))
+    gate = ChangeGate()
+    calm = json.dumps({"Emergency_Type": "Non-Emergency", "situation": "Quiet ward."})
+    alarm = json.dumps({"Emergency_Type": "Emergency", "situation": "A patient has collapsed."})
+
+    monkeypatch.setattr(nova_llm, "runtime", FakeRuntime(latency=0, text=calm))
+    assert nova_llm.image_process_llm("Describe the ward.", [grey_frame(0)], gate=gate, stream=False)[2]["Emergency_Type"] \
+        == "Non-Emergency"
+
+    # The scene changes but the call fails
+    monkeypatch.setattr(nova_llm, "runtime", FakeRuntime(latency=0, throttle_rate=1.0))
+    with pytest.raises(ClientError):
+        nova_llm.image_process_llm("Describe the ward.", [grey_frame(200)], gate=gate, stream=False)
+
+    # Once the model is back, the same changed frame is sent again instead of reusing the old answer
+    fake = FakeRuntime(latency=0, text=alarm)
+    monkeypatch.setattr(nova_llm, "runtime", fake)
+    response = nova_llm.image_process_llm("Describe the ward.", [grey_frame(200)], gate=gate, stream=False)[2]
+    assert (response["Emergency_Type"], fake.calls) == ("Emergency", 1)
+    assert (gate.escalated, gate.suppressed) == (2, 0)
+
+    # Now an unchanged frame reuses that answer
+    assert nova_llm.image_process_llm("Describe the ward.", [grey_frame(200)], gate=gate, stream=False)[2] == response
+    assert (fake.calls, gate.suppressed) == (1, 1)
@@ -0,0 +1,80 @@
+import cv2
+import numpy as np
+import pytest
+from conftest import StubResult, people_boxes
+
+from video_stream import CentroidTracker, FrameReader, analyze_stream
+
+FPS = 10
+FRAMES = 20
+
+
+@pytest.fixture
+def video(tmp_path):
+    # 2 seconds of 10 fps MJPEG, small enough to write and decode quickly
+    path = str(tmp_path / "clip.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), FPS, (160, 120))
+    assert writer.isOpened()
+    for i in range(FRAMES):
+        frame = np.full((120, 160, 3), i * 10, dtype=np.uint8)
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+class WalkingModel:
+    # A group of four people drifting right 4 px per analysed frame, one
+    # bystander standing still and a non-person that is always ignored
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, image, **kwargs):
+        step = 4 * self.calls
+        self.calls += 1
+        group = [(200 + step, 200), (230 + step, 200), (200 + step, 230), (230 + step, 230)]
+        data = people_boxes(group + [(1000, 600)]) + people_boxes([(600, 300)], cls=2)
+        return [StubResult(data)]
+
+
+def test_reader_samples_file_at_target_fps(video):
+    reader = FrameReader(video, target_fps=5).start()
+    indexes = []
+    while (item := reader.frames.get()) is not None:
+        indexes.append(item[0])
+    assert reader.error is None
+    assert reader.dropped == 0  # files are never dropped, the reader waits instead
+    assert indexes == list(range(0, FRAMES, 2))
+
+
+def test_stream_keeps_identities_across_frames(video):
+    model = WalkingModel()
+    statuses = list(analyze_stream(video, model, target_fps=5, live=False))
+
+    assert len(statuses) == FRAMES // 2 == model.calls
+    first_ids = set(statuses[0]["tracks"])
+    for status in statuses:
+        assert status["people_count"] == 5
+        assert status["cluster_count"] == 1
+        assert status["crowd_status"] == "Crowd"
+        # The walkers move less than max_distance per frame, so nobody gets a new id
+        assert set(status["tracks"]) == first_ids
+    # Small moves reuse the labels; the group has walked far enough by the end to re-cluster
+    assert 1 < statuses[-1]["reclustered"] < len(statuses)
+
+
+def test_stream_centroids_match_extract_people(video):
+    status = next(analyze_stream(video, WalkingModel(), target_fps=5, live=False))
+    assert sorted(map(tuple, status["tracks"].values())) == [(200, 200), (200, 230), (230, 200), (230, 230), (1000, 600)]
+
+
+def test_tracker_new_and_lost_tracks():
+    tracker = CentroidTracker(max_distance=50, max_missed=1)
+    first = tracker.update([[0, 0], [500, 500]])
+    assert first.tolist() == [0, 1]
+    # Both moved a little; a newcomer far from either gets a fresh id
+    assert tracker.update([[510, 500], [10, 0], [900, 900]]).tolist() == [1, 0, 2]
+    # Track 2 is missed twice (more than max_missed) and then forgotten
+    tracker.update([[10, 0], [510, 500]])
+    tracker.update([[10, 0], [510, 500]])
+    assert tracker.update([[900, 900]]).tolist() == [3]
@@ -0,0 +1,30 @@
+import cv2
+import numpy as np
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from zone_routes import router
+
+app = FastAPI()
+app.include_router(router)
+api = TestClient(app)
+
+
+@pytest.fixture
+def camera():
+    response = api.put("/zones/heatmap-cam", json={"zones": {"door": [[0, 0], [0.5, 0], [0.5, 0.5], [0, 0.5]]}})
+    assert response.status_code == 200
+    return "heatmap-cam"
+
+
+def test_heatmap_png_has_the_requested_width(camera):
+    response = api.get(f"/zones/{camera}/heatmap", params={"width": 320})
+    assert response.headers["content-type"] == "image/png"
+    image = cv2.imdecode(np.frombuffer(response.content, np.uint8), cv2.IMREAD_COLOR)
+    assert image.shape[1] == 320
+
+
+@pytest.mark.parametrize("width", [0, -5, 4097, 1_000_000])
+def test_heatmap_width_is_bounded(camera, width):
+    assert api.get(f"/zones/{camera}/heatmap", params={"width": width}).status_code == 422
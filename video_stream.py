@@ -0,0 +1,216 @@
+import os
+import sys
+import time
+import queue
+import threading
+import cv2
+import numpy as np
+from clustering import cluster_points
+from inference_profile import fit_size, get_profile, inference_kwargs, load_model, resize_to_fit
+from postprocess import extract_people
+
+# Frames per second analysed from each camera (override with environment variables)
+TARGET_FPS = float(os.environ.get("STREAM_TARGET_FPS", "2"))
+FRAME_QUEUE_SIZE = int(os.environ.get("STREAM_QUEUE_SIZE", "4"))
+
+
+def is_live_source(source):
+    # Cameras and network streams can't wait for us; files can
+    return isinstance(source, int) or str(source).isdigit() or "://" in str(source)
+
+
+class FrameReader:
+    # Decodes frames in a producer thread. Frames between analysis slots are
+    # skipped with grab() so they are never decoded. For live sources the queue
+    # keeps only the newest frames, dropping the oldest when inference lags.
+
+    def __init__(self, source, target_fps=TARGET_FPS, queue_size=FRAME_QUEUE_SIZE, live=None):
+        self.source = int(source) if str(source).isdigit() else source
+        self.interval_ms = 1000.0 / target_fps if target_fps > 0 else 0.0
+        self.live = is_live_source(source) if live is None else live
+        self.frames = queue.Queue(maxsize=max(1, queue_size))
+        self.dropped = 0
+        self.error = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="frame-reader", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _put(self, item):
+        while not self._stop.is_set():
+            try:
+                self.frames.put(item, timeout=0.1 if not self.live else 0)
+                return
+            except queue.Full:
+                if self.live:
+                    try:
+                        self.frames.get_nowait()
+                        self.dropped += 1
+                    except queue.Empty:
+                        pass
+
+    def _run(self):
+        cap = cv2.VideoCapture(self.source)
+        try:
+            if not cap.isOpened():
+                self.error = f"Could not open video source {self.source}"
+                return
+
+            fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+            frame_index = 0
+            next_ms = 0.0
+            while not self._stop.is_set():
+                if not cap.grab():
+                    break
+
+                if self.live:
+                    timestamp_ms = time.monotonic() * 1000.0
+                else:
+                    timestamp_ms = frame_index * 1000.0 / fps
+
+                if timestamp_ms >= next_ms:
+                    ret, frame = cap.retrieve()
+                    if ret:
+                        self._put((frame_index, timestamp_ms, frame))
+                        next_ms = max(next_ms + self.interval_ms, timestamp_ms)
+                frame_index += 1
+        finally:
+            cap.release()
+            self._put(None)
+
+
+class CentroidTracker:
+    # Keeps person identities across frames by greedily matching each new
+    # centroid to the nearest track that moved less than max_distance pixels.
+
+    def __init__(self, max_distance=80, max_missed=5):
+        self.max_distance = max_distance
+        self.max_missed = max_missed
+        self.next_id = 0
+        self.ids = np.empty(0, dtype=int)
+        self.points = np.empty((0, 2), dtype=float)
+        self.missed = np.empty(0, dtype=int)
+
+    def update(self, points):
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        assigned = np.full(len(points), -1, dtype=int)
+        matched = np.zeros(len(self.ids), dtype=bool)
+
+        if len(self.ids) and len(points):
+            distances = np.linalg.norm(self.points[:, None, :] - points[None, :, :], axis=2)
+            track_idx, point_idx = np.unravel_index(np.argsort(distances, axis=None), distances.shape)
+            for t, p in zip(track_idx, point_idx):
+                if distances[t, p] > self.max_distance:
+                    break
+                if matched[t] or assigned[p] != -1:
+                    continue
+                matched[t] = True
+                assigned[p] = self.ids[t]
+                self.points[t] = points[p]
+
+        # Tracks that weren't seen are kept for a few frames before being dropped
+        self.missed = np.where(matched, 0, self.missed + 1)
+        keep = self.missed <= self.max_missed
+        self.ids, self.points, self.missed = self.ids[keep], self.points[keep], self.missed[keep]
+
+        new = assigned == -1
+        assigned[new] = np.arange(self.next_id, self.next_id + new.sum())
+        self.next_id += int(new.sum())
+        self.ids = np.concatenate([self.ids, assigned[new]])
+        self.points = np.vstack([self.points, points[new]])
+        self.missed = np.concatenate([self.missed, np.zeros(new.sum(), dtype=int)])
+        return assigned
+
+
+class ClusterState:
+    # Reuses the previous DBSCAN labels while the same people stay roughly in
+    # place, and only re-clusters when tracks appear, vanish or move.
+
+    def __init__(self, move_threshold=25):
+        self.move_threshold = move_threshold
+        self.labels = {}
+        self.points = {}
+        self.reclustered = 0
+
+    def update(self, track_ids, points):
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        unchanged = set(track_ids.tolist()) == set(self.labels)
+        if unchanged and len(track_ids):
+            previous = np.array([self.points[i] for i in track_ids.tolist()])
+            unchanged = np.linalg.norm(points - previous, axis=1).max() < self.move_threshold
+
+        if unchanged:
+            return np.array([self.labels[i] for i in track_ids.tolist()], dtype=int)
+
+        labels = np.full(len(points), -1, dtype=int)
+        if len(points) >= 2:
+            labels, _, _, _ = cluster_points(points)
+        self.labels = dict(zip(track_ids.tolist(), labels.tolist()))
+        self.points = dict(zip(track_ids.tolist(), points))
+        self.reclustered += 1
+        return labels
+
+
+def analyze_stream(source, model, target_fps=TARGET_FPS, queue_size=FRAME_QUEUE_SIZE, live=None, conf=0.3, profile=None):
+    # Yields one crowd status per analysed frame until the source ends
+    predict_kwargs = inference_kwargs(profile or get_profile(), conf)
+    reader = FrameReader(source, target_fps, queue_size, live).start()
+    tracker = CentroidTracker()
+    clusters = ClusterState()
+    # Frames from one stream share a size, so they are all scaled into one buffer
+    resized = None
+    try:
+        while True:
+            item = reader.frames.get()
+            if item is None:
+                break
+            frame_index, timestamp_ms, frame = item
+
+            start = time.perf_counter()
+            size = fit_size(frame.shape[1], frame.shape[0])
+            if size is not None and (resized is None or resized.shape[:2] != (size[1], size[0])):
+                resized = np.empty((size[1], size[0], 3), dtype=np.uint8)
+            result = model(resize_to_fit(frame, dst=resized if size is not None else None), **predict_kwargs)[0]
+            inference_ms = (time.perf_counter() - start) * 1000
+
+            # Same person filter and integer centre points as the detection services
+            _, points, _ = extract_people(result)
+            track_ids = tracker.update(points)
+            labels = clusters.update(track_ids, points)
+            cluster_count = len(set(labels.tolist()) - {-1})
+
+            yield {
+                "frame": frame_index,
+                "timestamp_ms": timestamp_ms,
+                "crowd_status": "Crowd" if cluster_count > 0 else "No Crowd",
+                "people_count": len(points),
+                "cluster_count": cluster_count,
+                "tracks": {int(i): [float(x), float(y)] for i, (x, y) in zip(track_ids, points)},
+                "inference_ms": inference_ms,
+                "dropped_frames": reader.dropped,
+                "reclustered": clusters.reclustered
+            }
+
+        if reader.error:
+            print(f"Error: {reader.error}")
+    finally:
+        reader.stop()
+
+
+if __name__ == "__main__":
+    # python video_stream.py <source> [profile]; each camera can run its own profile
+    source = sys.argv[1] if len(sys.argv) > 1 else 0
+    profile = get_profile(sys.argv[2] if len(sys.argv) > 2 else None)
+    model = load_model(profile)
+    for status in analyze_stream(source, model, profile=profile):
+        print(f"frame {status['frame']}: {status['crowd_status']} "
+              f"({status['people_count']} people, {status['cluster_count']} clusters, "
+              f"{status['inference_ms']:.0f} ms, {status['dropped_frames']} dropped)")
@@ -0,0 +1,62 @@
+import cv2
+import numpy as np
+from typing import Dict, List, Optional
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import Response
+from pydantic import BaseModel
+from zones import get_camera_zones, list_cameras, set_camera_zones
+
+# Zone configuration, live occupancy and density heatmaps, shared by the detection services
+router = APIRouter()
+
+
+class ZonesItem(BaseModel):
+    zones: Dict[str, List[List[float]]]  # Zone name -> [x, y] vertices as fractions of the frame
+
+
+def _camera(camera_id):
+    camera = get_camera_zones(camera_id)
+    if camera is None:
+        raise HTTPException(status_code=404, detail="No zones or detections for this camera.")
+    return camera
+
+
+@router.get("/zones")
+def all_zones():
+    return {camera_id: camera.status() for camera_id, camera in list_cameras().items()}
+
+
+@router.put("/zones/{camera_id}")
+def put_zones(camera_id: str, item: ZonesItem):
+    # Replaces the camera's zones; its heatmap is kept
+    try:
+        camera = set_camera_zones(camera_id, item.zones)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return camera.status()
+
+
+@router.get("/zones/{camera_id}")
+def camera_zones(camera_id: str):
+    return _camera(camera_id).status()
+
+
+@router.get("/zones/{camera_id}/heatmap")
+def camera_heatmap(camera_id: str, format: Optional[str] = None, width: int = Query(640, gt=0, le=4096)):
+    camera = _camera(camera_id)
+    grid = camera.heatmap_at()
+    if format and format.lower() == "json":
+        return {"rows": camera.rows, "cols": camera.cols, "half_life": camera.half_life,
+                "updated": camera.updated, "grid": np.round(grid, 3).tolist()}
+
+    # Colour-mapped grid scaled to its own peak, with the zone outlines on top
+    peak = grid.max()
+    scaled = (grid / peak * 255 if peak > 0 else grid).astype(np.uint8)
+    height = max(1, round(width * camera.rows / camera.cols))
+    image = cv2.resize(cv2.applyColorMap(scaled, cv2.COLORMAP_JET), (width, height), interpolation=cv2.INTER_NEAREST)
+    for name, polygon in camera.status()["zones"].items():
+        corners = np.round(np.asarray(polygon) * (width - 1, height - 1)).astype(np.int32)
+        cv2.polylines(image, [corners], True, (255, 255, 255), 2)
+        cv2.putText(image, name, tuple(int(v) for v in corners[0]), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+    _, encoded = cv2.imencode(".png", image)
+    return Response(content=encoded.tobytes(), media_type="image/png")
@@ -0,0 +1,155 @@
+import os
+import json
+import time
+import threading
+import numpy as np
+from event_store import record_event
+
+# Zones per camera, e.g. {"cam-1": {"Reception counter": [[0.1, 0.5], [0.4, 0.5], [0.4, 0.9], [0.1, 0.9]]}}.
+# Vertices are fractions of the frame width and height, so they don't depend on resolution.
+ZONES_FILE = os.environ.get("ZONES_FILE")
+# Heatmap grid size and how quickly old detections fade (override with environment variables)
+HEATMAP_ROWS = int(os.environ.get("HEATMAP_ROWS", "36"))
+HEATMAP_COLS = int(os.environ.get("HEATMAP_COLS", "64"))
+HEATMAP_HALF_LIFE = float(os.environ.get("HEATMAP_HALF_LIFE", "300"))
+
+
+def parse_polygon(vertices):
+    polygon = np.asarray(vertices, dtype=np.float64)
+    if polygon.ndim != 2 or polygon.shape[1] != 2 or len(polygon) < 3:
+        raise ValueError("A zone needs at least 3 [x, y] vertices.")
+    if polygon.min() < 0 or polygon.max() > 1:
+        raise ValueError("Zone vertices are fractions of the frame size, between 0 and 1.")
+    return polygon
+
+
+def points_in_polygon(points, polygon):
+    # Even-odd rule for all points against all edges at once: (n points, m edges)
+    x, y = points[:, :1], points[:, 1:]
+    x1, y1 = polygon[:, 0], polygon[:, 1]
+    x2, y2 = np.roll(x1, -1), np.roll(y1, -1)
+    crosses = (y1 > y) != (y2 > y)
+    # Horizontal edges divide by zero, but they never cross so the result is masked out
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x_cross = x1 + (y - y1) * (x2 - x1) / (y2 - y1)
+    return np.count_nonzero(crosses & (x < x_cross), axis=1) % 2 == 1
+
+
+def decay_factor(elapsed, half_life=HEATMAP_HALF_LIFE):
+    return 0.5 ** (max(0.0, elapsed) / half_life)
+
+
+class CameraZones:
+    # Zone occupancy and a decaying density grid for one camera. Each update
+    # decays the grid by the time since the last one and adds the new people,
+    # so the history is never rescanned.
+
+    def __init__(self, zones=None, rows=HEATMAP_ROWS, cols=HEATMAP_COLS, half_life=HEATMAP_HALF_LIFE):
+        self.rows = rows
+        self.cols = cols
+        self.half_life = half_life
+        self.heatmap = np.zeros((rows, cols), dtype=np.float32)
+        self.updated = None
+        self.frames = 0
+        self.zones = {}
+        self.occupancy = {}
+        self._lock = threading.Lock()
+        self.set_zones(zones or {})
+
+    def set_zones(self, zones):
+        polygons = {name: parse_polygon(vertices) for name, vertices in zones.items()}
+        with self._lock:
+            self.zones = polygons
+            self.occupancy = {name: self.occupancy.get(name, {"count": 0, "average": 0.0, "peak": 0})
+                              for name in polygons}
+
+    def update(self, centroids, image_size, timestamp=None):
+        timestamp = time.time() if timestamp is None else timestamp
+        width, height = image_size
+        points = np.asarray(centroids, dtype=np.float64).reshape(-1, 2) / (width, height)
+
+        # Flat grid index per person, counted in one pass
+        cells = (np.clip((points[:, 1] * self.rows).astype(int), 0, self.rows - 1) * self.cols
+                 + np.clip((points[:, 0] * self.cols).astype(int), 0, self.cols - 1))
+        density = np.bincount(cells, minlength=self.rows * self.cols).reshape(self.rows, self.cols)
+
+        with self._lock:
+            decay = decay_factor(timestamp - self.updated, self.half_life) if self.updated is not None else 0.0
+            self.heatmap *= decay
+            self.heatmap += density
+            self.updated = timestamp
+            self.frames += 1
+
+            counts = {}
+            for name, polygon in self.zones.items():
+                count = int(np.count_nonzero(points_in_polygon(points, polygon))) if len(points) else 0
+                zone = self.occupancy[name]
+                # Time-decayed mean occupancy with the same half-life as the heatmap
+                zone["average"] = zone["average"] * decay + count * (1 - decay)
+                zone["count"] = count
+                zone["peak"] = max(zone["peak"], count)
+                counts[name] = count
+        return counts
+
+    def heatmap_at(self, now=None):
+        # The grid decayed to now, without changing the stored one
+        now = time.time() if now is None else now
+        with self._lock:
+            if self.updated is None:
+                return self.heatmap.copy()
+            return self.heatmap * decay_factor(now - self.updated, self.half_life)
+
+    def status(self):
+        with self._lock:
+            return {
+                "zones": {name: polygon.tolist() for name, polygon in self.zones.items()},
+                "occupancy": {name: dict(zone) for name, zone in self.occupancy.items()},
+                "frames": self.frames,
+                "updated": self.updated
+            }
+
+
+_cameras = {}
+_cameras_lock = threading.Lock()
+
+
+def get_camera_zones(camera_id, create=False):
+    camera_id = camera_id or "default"
+    with _cameras_lock:
+        camera = _cameras.get(camera_id)
+        if camera is None and create:
+            camera = _cameras[camera_id] = CameraZones()
+        return camera
+
+
+def set_camera_zones(camera_id, zones):
+    camera = get_camera_zones(camera_id, create=True)
+    camera.set_zones(zones)
+    return camera
+
+
+def list_cameras():
+    with _cameras_lock:
+        return dict(_cameras)
+
+
+def load_zones(path=ZONES_FILE):
+    if not path:
+        return
+    with open(path) as f:
+        for camera_id, zones in json.load(f).items():
+            set_camera_zones(camera_id, zones)
+
+
+def observe(camera_id, section, detections):
+    # Updates the camera's heatmap and zones and queues one event per zone;
+    # returns the per-zone counts for this frame
+    camera = get_camera_zones(camera_id, create=True)
+    timestamp = time.time()
+    counts = camera.update(detections["centroids"], detections["image_size"], timestamp)
+    for zone, count in counts.items():
+        record_event("zone", camera_id, section, timestamp=timestamp, zone=zone, people_count=count)
+    return counts
+
+
+load_zones()